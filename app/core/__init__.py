@@ -0,0 +1,5 @@
+"""
+Shared helpers for the Real Estate Analytics app
+Pages import these as ``core.<module>`` (Streamlit puts ``app/`` on sys.path);
+command line tools run them from the project root as ``python -m app.core.<module>``.
+"""
@@ -0,0 +1,337 @@
+"""
+Materialized aggregate cube for the Analytics Dashboard
+Listings are reduced once, vectorized, to one row per
+sector x property_type x bedRoom holding counts, per-column non-null counts,
+sums, sums of squares,
+a log-bucket price quantile sketch, a price histogram on shared bin edges
+and lat/long sums (centroids). Every stored column is mergeable, so new
+listings are folded into the persisted cube in O(batch + groups) without
+revisiting old rows. Charts render from the cube or its rollups, so their
+cost depends on the number of groups rather than the number of listings.
+The appended batches are also kept as their own delta cube, which a rebuild
+from data_viz1.csv merges back in unless told to discard it.
+
+Usage (from the project root):
+    python -m app.core.aggregates build
+    python -m app.core.aggregates build --discard-appended
+    python -m app.core.aggregates append new_listings.csv
+"""
+
+import argparse
+import functools
+import json
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+from .columnar import (COLUMNAR_DIR, CURRENT_FILE, SCHEMA_FILE, current_build, read_build, source_signature,
+                       write_table)
+from .viz_data import VIZ_DATA_PATH, load_viz_data, read_viz_csv
+
+CUBE_DIR = os.path.join(COLUMNAR_DIR, 'viz_cube')
+APPENDED_TABLE = 'appended'
+CUBE_KEYS = ['sector', 'property_type', 'bedRoom']
+SUM_COLUMNS = ['price', 'price_per_sqft', 'built_up_area', 'latitude', 'longitude']
+QUANTILES = [0.05, 0.25, 0.5, 0.75, 0.95]
+HIST_BINS = 60
+
+# Log-bucket sketch: bucket i holds prices in (gamma^(i-1), gamma^i], so any
+# quantile read back is within SKETCH_ACCURACY relative error
+SKETCH_ACCURACY = 0.02
+SKETCH_GAMMA = (1 + SKETCH_ACCURACY) / (1 - SKETCH_ACCURACY)
+SKETCH_MIN, SKETCH_MAX = 0.01, 1000.0
+SKETCH_OFFSET = int(np.ceil(np.log(SKETCH_MIN) / np.log(SKETCH_GAMMA)))
+SKETCH_BUCKETS = int(np.ceil(np.log(SKETCH_MAX) / np.log(SKETCH_GAMMA))) - SKETCH_OFFSET + 1
+
+
+def sketch_buckets(prices):
+    clipped = np.clip(prices, SKETCH_MIN, SKETCH_MAX)
+    return np.ceil(np.log(clipped) / np.log(SKETCH_GAMMA)).astype(np.int64) - SKETCH_OFFSET
+
+
+def sketch_edges():
+    """Bucket boundaries of the quantile sketch: bucket i holds prices in (edges[i], edges[i + 1]]."""
+    return SKETCH_GAMMA ** (np.arange(SKETCH_BUCKETS + 1) + SKETCH_OFFSET - 1)
+
+
+def sketch_quantiles(counts, quantiles=QUANTILES):
+    """Quantiles per row of a (groups x SKETCH_BUCKETS) count matrix -> (groups x len(quantiles))."""
+    cumulative = np.cumsum(counts, axis=1)
+    ranks = np.outer(cumulative[:, -1] - 1, quantiles)
+    index = (cumulative[:, None, :] > ranks[:, :, None]).argmax(axis=2)
+    return 2 * SKETCH_GAMMA ** (index + SKETCH_OFFSET) / (SKETCH_GAMMA + 1)
+
+
+def hist_edges(prices, bins=HIST_BINS):
+    return np.linspace(0.0, float(np.ceil(np.max(prices))), bins + 1)
+
+
+def complete_rows(df):
+    """Rows with every cube key and a price; a missing key has no group to count in."""
+    return df.dropna(subset=CUBE_KEYS + ['price'])
+
+
+def build_cube(df, edges=None):
+    """
+    Return ``(cube, edges)``; ``cube`` has one row per observed key
+    combination. Rows missing a key or price are left out.
+    """
+    df = complete_rows(df)
+    prices = df['price'].to_numpy(np.float64)
+    edges = hist_edges(prices) if edges is None else edges
+
+    keys = df[CUBE_KEYS].astype({'sector': str, 'property_type': str, 'bedRoom': np.float64})
+    groups = keys.groupby(CUBE_KEYS, sort=True, observed=True)
+    codes = groups.ngroup().to_numpy()
+    n_groups = groups.ngroups
+
+    cube = groups.size().rename('count').reset_index()
+    for column in SUM_COLUMNS:
+        # Missing values count in neither the sum nor the column's own n_
+        values = df[column].to_numpy(np.float64)
+        present = ~np.isnan(values)
+        values = np.where(present, values, 0.0)
+        cube[f'n_{column}'] = np.bincount(codes, weights=present, minlength=n_groups).astype(np.int64)
+        cube[f'sum_{column}'] = np.bincount(codes, weights=values, minlength=n_groups)
+        cube[f'sumsq_{column}'] = np.bincount(codes, weights=values * values, minlength=n_groups)
+
+    cube['price_min'] = pd.Series(prices).groupby(codes).min().to_numpy()
+    cube['price_max'] = pd.Series(prices).groupby(codes).max().to_numpy()
+
+    # Histogram counts per group on the shared edges (last bin closed on the right)
+    n_bins = len(edges) - 1
+    bins = np.clip(np.searchsorted(edges, prices, side='right') - 1, 0, n_bins - 1)
+    hist = np.bincount(codes * n_bins + bins, minlength=n_groups * n_bins).reshape(n_groups, n_bins)
+
+    flat = codes * SKETCH_BUCKETS + sketch_buckets(prices)
+    sketch = np.bincount(flat, minlength=n_groups * SKETCH_BUCKETS).reshape(n_groups, SKETCH_BUCKETS)
+    cube = pd.concat([cube,
+                      pd.DataFrame(hist, columns=[f'hist_{i}' for i in range(n_bins)]),
+                      pd.DataFrame(sketch, columns=[f'sketch_{i}' for i in range(SKETCH_BUCKETS)])], axis=1)
+    return with_quantiles(cube), edges
+
+
+def with_quantiles(cube):
+    """(Re)derive the price_qNN columns from the cube's sketch."""
+    columns = [f'price_q{int(q * 100):02d}' for q in QUANTILES]
+    quantiles = pd.DataFrame(sketch_quantiles(sketch_matrix(cube)), columns=columns, index=cube.index)
+    return pd.concat([cube.drop(columns=columns, errors='ignore'), quantiles], axis=1)
+
+
+def hist_matrix(cube):
+    return cube[[c for c in cube.columns if c.startswith('hist_')]].to_numpy()
+
+
+def sketch_matrix(cube):
+    return cube[[f'sketch_{i}' for i in range(SKETCH_BUCKETS)]].to_numpy()
+
+
+def additive_columns(cube):
+    return ['count'] + [c for c in cube.columns if c.startswith(('n_', 'sum_', 'sumsq_', 'hist_', 'sketch_'))]
+
+
+def merge_cubes(cube, delta):
+    """Combine two cubes built on the same histogram edges."""
+    combined = pd.concat([cube, delta], ignore_index=True)
+    grouped = combined.groupby(CUBE_KEYS, sort=True, observed=True)
+    merged = pd.concat([grouped[additive_columns(combined)].sum(),
+                        grouped['price_min'].min(), grouped['price_max'].max()], axis=1)
+    keys = merged.index.to_frame(index=False)
+    return with_quantiles(pd.concat([keys, merged.reset_index(drop=True)], axis=1))
+
+
+def rollup(cube, by):
+    """
+    Sum the cube over every key not in ``by`` and derive means, centroids
+    and sketch quantiles.
+    """
+    rolled = cube.groupby(by, sort=True, observed=True)[additive_columns(cube)].sum()
+    means = pd.DataFrame({column: rolled[f'sum_{column}'] / rolled[f'n_{column}'] for column in SUM_COLUMNS})
+    return with_quantiles(pd.concat([rolled, means], axis=1))
+
+
+def totals(cube):
+    count = cube['count'].sum()
+    return {
+        'properties': int(count),
+        'sectors': int(cube.loc[cube['count'] > 0, 'sector'].nunique()),
+        'avg_price': float(cube['sum_price'].sum() / cube['n_price'].sum()),
+        'avg_price_per_sqft': float(cube['sum_price_per_sqft'].sum() / cube['n_price_per_sqft'].sum()),
+    }
+
+
+def save_cube(cube, edges, meta, directory=CUBE_DIR, appended=None):
+    # Cube, edges, meta and the appended delta are published together as one
+    # new build, so dashboards memory-mapping the previous build are never
+    # written under
+    tables = {APPENDED_TABLE: appended} if appended is not None else None
+    write_table(cube, directory, meta=meta, arrays={'hist_edges': edges}, tables=tables)
+
+
+def _current_cube(directory):
+    """``(build directory, meta)`` of the live cube, or ``(None, None)``."""
+    try:
+        build = current_build(directory)
+        with open(os.path.join(build, SCHEMA_FILE)) as f:
+            return build, json.load(f).get('meta')
+    except (OSError, ValueError):
+        return None, None
+
+
+def _appended_cube(build):
+    """Delta cube of every batch appended since the build, or None."""
+    path = os.path.join(build, APPENDED_TABLE)
+    return read_build(path, mmap=False) if os.path.isdir(path) else None
+
+
+def read_meta(directory=CUBE_DIR):
+    return _current_cube(directory)[1]
+
+
+def source_version(path=VIZ_DATA_PATH):
+    """Signature of the listings CSV a cube is built from."""
+    return source_signature(path)
+
+
+def is_current(directory=CUBE_DIR, path=VIZ_DATA_PATH):
+    """True when the persisted cube was built from the listings CSV as it is now."""
+    meta = read_meta(directory)
+    try:
+        return meta is not None and meta.get('source_version') == source_version(path)
+    except OSError:
+        return False
+
+
+def cube_version(directory=CUBE_DIR):
+    """Changes whenever the persisted cube is rebuilt or appended to; None if absent."""
+    try:
+        return os.stat(os.path.join(directory, CURRENT_FILE)).st_mtime_ns
+    except OSError:
+        return None
+
+
+def load_saved_cube(directory=CUBE_DIR):
+    """The persisted ``(cube, edges)`` if it was built from the current listings CSV, else None."""
+    build, meta = _current_cube(directory)
+    if meta is None or not is_current(directory):
+        return None
+    return read_build(build), np.load(os.path.join(build, 'hist_edges.npy'))
+
+
+def cube_from(df):
+    return load_saved_cube() or build_cube(df)
+
+
+_memo_lock = threading.Lock()
+_memo = {}
+
+
+def _versioned(key, version, compute):
+    with _memo_lock:
+        cached = _memo.get(key)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+    value = compute()
+    with _memo_lock:
+        _memo[key] = (version, value)
+    return value
+
+
+def get_cube(viz_data):
+    """
+    ``(cube, edges)`` for the listings Artifact: the persisted cube (with any
+    appended batches) when it was built from the current CSV, otherwise built in
+    memory. Cached until the data or the persisted cube changes.
+    """
+    version = (viz_data.version, cube_version())
+    return _versioned(('cube', viz_data.path), version, lambda: cube_from(viz_data.obj))
+
+
+def memoize_on_cube(fn):
+    """
+    Cache ``fn(cube, *args)`` until the data or the persisted cube changes.
+    Called with the listings Artifact.
+    """
+    @functools.wraps(fn)
+    def wrapper(viz_data, *args):
+        version = (viz_data.version, cube_version())
+        return _versioned((fn.__name__, viz_data.path, args), version, lambda: fn(get_cube(viz_data)[0], *args))
+    return wrapper
+
+
+def build_and_save(keep_appended=True, directory=CUBE_DIR):
+    """
+    Rebuild the cube from data_viz1.csv and merge back the batches appended
+    to the previous cube, on its histogram edges (``keep_appended=False``
+    drops them, e.g. once they have been added to the CSV). Returns
+    ``(cube, edges, meta)``.
+    """
+    viz_data = load_viz_data()
+    build, meta = _current_cube(directory)
+    appended = _appended_cube(build) if keep_appended and build is not None else None
+    if appended is None:
+        cube, edges = build_cube(viz_data.obj)
+        meta = {'appended_rows': 0, 'appended_batches': 0, 'skipped_rows': 0}
+    else:
+        edges = np.load(os.path.join(build, 'hist_edges.npy'))
+        cube = merge_cubes(build_cube(viz_data.obj, edges)[0], appended)
+    meta['source_version'] = source_version()
+    save_cube(cube, edges, meta, directory, appended)
+    return cube, edges, meta
+
+
+def append_listings(batch, directory=CUBE_DIR):
+    """
+    Fold a frame of new listings into the persisted cube. Cost is one pass
+    over the batch plus a merge over the cube's groups; prices beyond the
+    histogram range land in its end bins, and rows without a sector,
+    property type, BHK or price are skipped. Single writer assumed.
+    """
+    build, meta = _current_cube(directory)
+    if meta is None:
+        raise FileNotFoundError(f'No aggregate cube in {directory}; run the build first')
+    edges = np.load(os.path.join(build, 'hist_edges.npy'))
+    cube = read_build(build, mmap=False)
+    appended = _appended_cube(build)
+    rows = complete_rows(batch)
+    if len(rows):
+        delta = build_cube(rows, edges)[0]
+        cube = merge_cubes(cube, delta)
+        appended = delta if appended is None else merge_cubes(appended, delta)
+    # Cubes saved before these counters existed start from zero
+    meta['appended_rows'] = meta.get('appended_rows', 0) + len(rows)
+    meta['appended_batches'] = meta.get('appended_batches', 0) + 1
+    meta['skipped_rows'] = meta.get('skipped_rows', 0) + len(batch) - len(rows)
+    save_cube(cube, edges, meta, directory, appended)
+    return cube, meta
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or append to the dashboard aggregate cube")
+    commands = parser.add_subparsers(dest='command')
+    build = commands.add_parser('build', help="Rebuild the cube from the listings dataset")
+    build.add_argument('--discard-appended', action='store_true',
+                       help="Drop the appended listings (e.g. after adding them to data_viz1.csv)")
+    append = commands.add_parser('append', help="Fold new listings (data_viz1 CSV layout) into the cube")
+    append.add_argument('csv', help="CSV of new listings")
+    args = parser.parse_args()
+
+    if args.command == 'append':
+        batch = read_viz_csv(args.csv)
+        cube, meta = append_listings(batch)
+        skipped = len(batch) - len(complete_rows(batch))
+        print(f'Appended {len(batch) - skipped:,} listings: {int(cube["count"].sum()):,} total in {len(cube):,} groups '
+              f'({meta["appended_batches"]} batches since build)')
+        if skipped:
+            print(f'Skipped {skipped:,} rows without a sector, property type, BHK or price')
+        return
+
+    cube, edges, meta = build_and_save(keep_appended=not getattr(args, 'discard_appended', False))
+    print(f'Cube: {len(cube):,} groups from {int(cube["count"].sum()):,} listings '
+          f'({meta["appended_rows"]:,} appended, {len(edges) - 1} histogram bins) -> {CUBE_DIR}')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+"""
+Approximate nearest-neighbour index for the apartment recommender
+The blended score 30*facilities + 20*price + 8*location is an inner product
+of concatenated, weight-scaled, L2-normalized component features, so one
+vector per property is enough. ``IVFIndex`` randomly projects those vectors
+to a few dimensions, clusters them with spherical k-means (NumPy only) and
+keeps one inverted list per cluster. A query scans the ``nprobe`` closest
+lists in the projected space and rescores the best ``rerank`` candidates
+exactly against the full features. The combined vectors are saved with the
+index as CSR parts and memory-mapped on load, so every process shares one
+copy instead of re-concatenating the features.
+
+Knobs: ``nlist`` (clusters), ``nprobe`` (lists scanned: recall vs latency),
+``dim`` (projection size) and ``rerank`` (exactly rescored candidates).
+
+Usage (from the project root):
+    python -m app.core.ann --nlist 64 --nprobe 1 2 4 8 16
+"""
+
+import argparse
+import os
+import time
+
+import numpy as np
+from scipy import sparse
+
+DEFAULT_DIM = 64
+DEFAULT_NPROBE = 8
+DEFAULT_RERANK = 100
+KMEANS_ITERATIONS = 10
+BLOCK = 8192
+INDEX_ARRAYS = ['projection', 'centroids', 'list_offsets', 'list_ids', 'projected']
+VECTOR_PARTS = ['data', 'indices', 'indptr']
+
+
+def combined_vectors(features, weights):
+    """One CSR row per property whose inner products equal the blended similarity."""
+    blocks = [sparse.csr_matrix(features[name]) * np.sqrt(weight) for name, weight in weights.items()]
+    return sparse.hstack(blocks, format='csr', dtype=np.float32)
+
+
+def _rows(matrix, ids):
+    block = matrix[ids]
+    return block.toarray() if sparse.issparse(block) else np.asarray(block)
+
+
+def _normalize(matrix):
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.where(norms > 0, norms, 1)
+
+
+def default_nlist(n):
+    return max(1, int(round(np.sqrt(n))))
+
+
+class IVFIndex:
+    """Inverted-file index over randomly projected vectors, with exact reranking."""
+
+    def __init__(self, projection, centroids, list_offsets, list_ids, projected, vectors=None):
+        self.projection = projection
+        self.centroids = centroids
+        self.list_offsets = list_offsets
+        self.list_ids = list_ids
+        self.projected = projected
+        self.vectors = vectors
+
+    @classmethod
+    def build(cls, vectors, nlist=None, dim=DEFAULT_DIM, iterations=KMEANS_ITERATIONS, seed=0):
+        n, d = vectors.shape
+        nlist = min(nlist or default_nlist(n), n)
+        rng = np.random.default_rng(seed)
+
+        # Gaussian random projection (skipped when it would not reduce anything)
+        if dim and dim < d:
+            projection = (rng.standard_normal((d, dim)) / np.sqrt(dim)).astype(np.float32)
+        else:
+            projection = np.zeros((0, 0), dtype=np.float32)
+        projected = np.empty((n, dim if projection.size else d), dtype=np.float32)
+        for start in range(0, n, BLOCK):
+            block = _rows(vectors, slice(start, start + BLOCK))
+            projected[start:start + BLOCK] = _normalize(block @ projection if projection.size else block)
+
+        # Spherical k-means on a sample, then assign every vector
+        sample = projected[rng.choice(n, size=min(n, 256 * nlist), replace=False)]
+        centroids = sample[rng.choice(len(sample), size=nlist, replace=False)].copy()
+        for _ in range(iterations):
+            assign = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assign, sample)
+            empty = ~np.bincount(assign, minlength=nlist).astype(bool)
+            sums[empty] = sample[rng.choice(len(sample), size=int(empty.sum()))]
+            centroids = _normalize(sums)
+
+        assign = np.concatenate([np.argmax(projected[start:start + BLOCK] @ centroids.T, axis=1)
+                                 for start in range(0, n, BLOCK)])
+        list_ids = np.argsort(assign, kind='stable').astype(np.int32)
+        list_offsets = np.searchsorted(assign[list_ids], np.arange(nlist + 1)).astype(np.int64)
+        return cls(projection, centroids, list_offsets, list_ids, projected, vectors)
+
+    @property
+    def nlist(self):
+        return len(self.centroids)
+
+    def search(self, row, k=5, nprobe=DEFAULT_NPROBE, rerank=DEFAULT_RERANK):
+        """Top-k (positions, blended scores) for the property at position ``row``, itself excluded."""
+        query = self.projected[row]
+        nprobe = min(nprobe, self.nlist)
+        lists = np.argpartition(-(self.centroids @ query), nprobe - 1)[:nprobe]
+        candidates = np.concatenate([self.list_ids[self.list_offsets[i]:self.list_offsets[i + 1]] for i in lists])
+        candidates = candidates[candidates != row]
+
+        if len(candidates) > rerank:
+            coarse = self.projected[candidates] @ query
+            candidates = candidates[np.argpartition(-coarse, rerank - 1)[:rerank]]
+        exact = (_rows(self.vectors, candidates) @ _rows(self.vectors, [row]).T).ravel()
+        top = np.argsort(-exact, kind='stable')[:k]
+        return candidates[top], exact[top]
+
+    def save(self, directory, prefix='ann'):
+        for name in INDEX_ARRAYS:
+            np.save(os.path.join(directory, f'{prefix}_{name}.npy'), getattr(self, name))
+        vectors = sparse.csr_matrix(self.vectors)
+        for part in VECTOR_PARTS:
+            np.save(os.path.join(directory, f'{prefix}_vectors_{part}.npy'), getattr(vectors, part))
+        np.save(os.path.join(directory, f'{prefix}_vectors_shape.npy'), np.asarray(vectors.shape, dtype=np.int64))
+
+    @classmethod
+    def load(cls, directory, prefix='ann'):
+        def array(name):
+            return np.load(os.path.join(directory, f'{prefix}_{name}.npy'), mmap_mode='r')
+
+        parts = tuple(array(f'vectors_{part}') for part in VECTOR_PARTS)
+        vectors = sparse.csr_matrix(parts, shape=tuple(array('vectors_shape')), copy=False)
+        return cls(*[array(name) for name in INDEX_ARRAYS], vectors=vectors)
+
+    @property
+    def nbytes(self):
+        arrays = [getattr(self, name) for name in INDEX_ARRAYS]
+        arrays += [getattr(self.vectors, part) for part in VECTOR_PARTS]
+        return sum(a.nbytes for a in arrays)
+
+
+def exact_neighbors(vectors, row, k):
+    """The page's exact blended ranking for one property (itself excluded)."""
+    scores = (vectors @ _rows(vectors, [row]).T)
+    scores = scores.toarray().ravel() if sparse.issparse(scores) else np.asarray(scores).ravel()
+    scores[row] = -np.inf
+    return np.argsort(-scores, kind='stable')[:k]
+
+
+def evaluate(index, k=5, nprobes=(1, 2, 4, 8, 16), rerank=DEFAULT_RERANK, queries=200, seed=0):
+    """recall@k against the exact blended ranking and mean query latency, per nprobe."""
+    n = index.vectors.shape[0]
+    rows = np.random.default_rng(seed).choice(n, size=min(queries, n), replace=False)
+    truth = {row: set(exact_neighbors(index.vectors, row, k).tolist()) for row in rows}
+    results = []
+    for nprobe in nprobes:
+        hits = 0
+        start = time.perf_counter()
+        for row in rows:
+            found, _ = index.search(row, k, nprobe, rerank)
+            hits += len(truth[row] & set(found.tolist()))
+        elapsed = time.perf_counter() - start
+        results.append({'nprobe': nprobe, f'recall@{k}': hits / (len(rows) * k),
+                        'query_ms': elapsed / len(rows) * 1000})
+    return results
+
+
+def main():
+    from .apartments import load_apartment_tables
+    from .recommender import WEIGHTS, build_features
+
+    parser = argparse.ArgumentParser(description="Evaluate the recommender ANN index against exact search")
+    parser.add_argument('--nlist', type=int, default=None, help="Clusters (default sqrt(N))")
+    parser.add_argument('--dim', type=int, default=DEFAULT_DIM, help="Random projection dimensions")
+    parser.add_argument('--rerank', type=int, default=DEFAULT_RERANK, help="Candidates rescored exactly")
+    parser.add_argument('--nprobe', type=int, nargs='+', default=[1, 2, 4, 8, 16], help="Lists scanned per query")
+    parser.add_argument('-k', type=int, default=5, help="Neighbours per query")
+    args = parser.parse_args()
+
+    _, features, _ = build_features(load_apartment_tables())
+    vectors = combined_vectors(features, WEIGHTS)
+    start = time.perf_counter()
+    index = IVFIndex.build(vectors, args.nlist, args.dim)
+    print(f'IVF index: {vectors.shape[0]:,} vectors, {index.nlist} lists, '
+          f'{index.projected.shape[1]} dims, built in {time.perf_counter() - start:.2f}s')
+    for result in evaluate(index, args.k, args.nprobe, args.rerank):
+        print(f"  nprobe={result['nprobe']:>3}  recall@{args.k}={result[f'recall@{args.k}']:.3f}  "
+              f"{result['query_ms']:.2f} ms/query")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+"""
+Apartment listings for the recommender
+``appartments.csv`` keeps facilities, price details and location advantages
+as Python-literal strings. They are parsed once (at build time when the
+columnar tables exist) into normalized long tables, from which the
+recommender's frames are rebuilt without any text parsing.
+"""
+
+import ast
+import json
+import re
+
+import numpy as np
+import pandas as pd
+
+from .columnar import is_fresh, read_table, table_dir
+
+APARTMENTS_PATH = 'app/data/appartments.csv'
+PRICE_CONFIGS = ['1 BHK', '2 BHK', '3 BHK', '4 BHK', '5 BHK', '6 BHK', '1 RK', 'Land']
+LISTING_COLUMNS = ['PropertyName', 'PropertySubName', 'NearbyLocations', 'Link']
+TABLES = ['apartments', 'apartment_facilities', 'apartment_prices', 'apartment_locations']
+
+
+def read_apartments_csv(path=APARTMENTS_PATH):
+    return pd.read_csv(path)
+
+
+def extract_list(s):
+    return re.findall(r"'(.*?)'", s)
+
+
+def _parse_number(part, unit_tokens):
+    for token in unit_tokens:
+        part = part.replace(token, '')
+    return float(part.strip())
+
+
+def refined_parse_modified_v2(detail_str):
+    """PriceDetails string -> {config: (building_type, area_low, area_high, price_low, price_high)}."""
+    try:
+        details = json.loads(detail_str.replace("'", "\""))
+    except:
+        return {}
+
+    extracted = {}
+    for bhk, detail in details.items():
+        area_low = area_high = price_low = price_high = None
+
+        # Parsing area details
+        area_parts = detail.get('area', '').split('-')
+        try:
+            if len(area_parts) == 1:
+                area_low = area_high = _parse_number(area_parts[0], [',', ' sq.ft.'])
+            elif len(area_parts) == 2:
+                area_low = _parse_number(area_parts[0], [',', ' sq.ft.'])
+                area_high = _parse_number(area_parts[1], [',', ' sq.ft.'])
+        except:
+            area_low = area_high = None
+
+        # Parsing price details (lakh values are converted to crore)
+        price_parts = detail.get('price-range', '').split('-')
+        if len(price_parts) == 2:
+            try:
+                price_low = _parse_number(price_parts[0], ['₹', ' Cr', ' L'])
+                price_high = _parse_number(price_parts[1], ['₹', ' Cr', ' L'])
+                if 'L' in price_parts[0]:
+                    price_low /= 100
+                if 'L' in price_parts[1]:
+                    price_high /= 100
+            except:
+                price_low = price_high = None
+
+        extracted[bhk] = (detail.get('building_type'), area_low, area_high, price_low, price_high)
+    return extracted
+
+
+def distance_to_meters(distance_str):
+    try:
+        if 'Km' in distance_str or 'KM' in distance_str:
+            return float(distance_str.split()[0]) * 1000
+        elif 'Meter' in distance_str or 'meter' in distance_str:
+            return float(distance_str.split()[0])
+        else:
+            return None
+    except:
+        return None
+
+
+def normalize_apartments(raw):
+    """
+    Split the raw CSV frame into long tables keyed by ``property`` (the CSV
+    row number): listings, facilities, price details and location distances.
+    """
+    facilities, prices, locations = [], [], []
+    for row_number, row in enumerate(raw.itertuples(index=False)):
+        for facility in extract_list(row.TopFacilities):
+            facilities.append((row_number, facility))
+        for config, values in refined_parse_modified_v2(row.PriceDetails).items():
+            prices.append((row_number, config) + values)
+        try:
+            advantages = ast.literal_eval(row.LocationAdvantages).items()
+        except:
+            continue
+        for location, distance in advantages:
+            locations.append((row_number, location, distance_to_meters(distance)))
+
+    listings = raw[LISTING_COLUMNS].copy()
+    listings.insert(0, 'property', np.arange(len(raw), dtype=np.int32))
+    return {
+        'apartments': listings,
+        'apartment_facilities': pd.DataFrame(facilities, columns=['property', 'facility'])
+            .astype({'property': np.int32}),
+        'apartment_prices': pd.DataFrame(prices, columns=['property', 'config', 'building_type', 'area_low',
+                                                          'area_high', 'price_low', 'price_high'])
+            .astype({'property': np.int32, 'area_low': float, 'area_high': float,
+                     'price_low': float, 'price_high': float}),
+        'apartment_locations': pd.DataFrame(locations, columns=['property', 'location', 'distance_m'])
+            .astype({'property': np.int32, 'distance_m': float}),
+    }
+
+
+def columnar_available(path=APARTMENTS_PATH):
+    return all(is_fresh(table_dir(name), path) for name in TABLES)
+
+
+def load_apartment_tables():
+    """Normalized tables, memory-mapped when built from the current CSV, otherwise parsed from it."""
+    if columnar_available():
+        return {name: read_table(table_dir(name)) for name in TABLES}
+    return normalize_apartments(read_apartments_csv())
+
+
+def listings_frame(tables):
+    """Listings indexed by CSV row, with ``TopFacilities`` as Python lists."""
+    df = tables['apartments'].set_index('property').rename_axis(None)
+    df = df.astype({c: object for c in LISTING_COLUMNS})
+    facilities = tables['apartment_facilities'].astype({'facility': str})
+    grouped = facilities.groupby('property', sort=False)['facility'].agg(list)
+    df['TopFacilities'] = grouped.reindex(df.index).apply(lambda v: v if isinstance(v, list) else [])
+    return df
+
+
+def price_frame(tables, properties):
+    """Wide price/area frame (one row per property in ``properties``) indexed by PropertyName."""
+    prices = tables['apartment_prices']
+    prices = prices[prices['config'].isin(PRICE_CONFIGS)]
+    prices = prices.astype({'config': str, 'building_type': object})
+
+    wide = pd.DataFrame(index=pd.Index(properties, name='property'))
+    for config in PRICE_CONFIGS:
+        rows = prices[prices['config'] == config].set_index('property').reindex(wide.index)
+        wide[f'building type_{config}'] = rows['building_type'].where(rows['building_type'].notna(), None)
+        wide[f'area low {config}'] = rows['area_low']
+        wide[f'area high {config}'] = rows['area_high']
+        wide[f'price low {config}'] = rows['price_low']
+        wide[f'price high {config}'] = rows['price_high']
+    return wide
+
+
+def location_frame(tables, properties):
+    """Distance (m) from each property to each named location; NaN where not listed."""
+    locations = tables['apartment_locations']
+    locations = locations[locations['property'].isin(properties)].astype({'location': str})
+    order = pd.unique(locations['location'])
+    wide = locations.pivot(index='property', columns='location', values='distance_m')
+    return wide.reindex(index=properties, columns=order)
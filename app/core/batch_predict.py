@@ -0,0 +1,213 @@
+"""
+Bulk price estimation
+Streams a CSV with the predictor's 12 input columns in chunks, scores each
+chunk with one vectorized pipeline call and appends the results to the output
+file as it goes, so memory stays flat regardless of portfolio size. Rows the
+model would reject (e.g. an unknown sector) are found up front and reported
+in an error column instead of aborting the run, and the output only replaces its target once
+every chunk has been written. ``--engine compiled`` scores with the exported
+NumPy kernel (see svr_kernel) when it matches the model.
+
+Usage (from the project root):
+    python -m app.core.batch_predict listings.csv -o priced.csv --workers 4
+    python -m app.core.batch_predict listings.csv --engine compiled
+"""
+
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from .model_store import MODEL_PATH
+from .svr_kernel import ENGINES, CompiledSVR, kernel_matches, load_model
+
+FEATURE_COLUMNS = ['property_type', 'sector', 'bedRoom', 'bathroom', 'balcony',
+                   'agePossession', 'built_up_area', 'servant room', 'store room',
+                   'furnishing_type', 'luxury_category', 'floor_category']
+
+# Explicit dtypes keep every chunk consistent with the training frame
+# (e.g. a chunk without '3+' must still read balcony as text)
+INPUT_DTYPES = {
+    'property_type': str, 'sector': str, 'bedRoom': float, 'bathroom': float,
+    'balcony': str, 'agePossession': str, 'built_up_area': float,
+    'servant room': float, 'store room': float, 'furnishing_type': float,
+    'luxury_category': str, 'floor_category': str,
+}
+
+PREDICTION_COLUMN = 'predicted_price'
+ERROR_COLUMN = 'prediction_error'
+DEFAULT_CHUNKSIZE = 5000
+
+
+def check_columns(columns):
+    missing = [c for c in FEATURE_COLUMNS if c not in columns]
+    if missing:
+        raise ValueError(f'Input is missing required columns: {missing}')
+
+
+def predict_frame(pipeline, frame):
+    """Price (in Cr) for every row of ``frame`` in a single predict call."""
+    return np.expm1(pipeline.predict(frame[FEATURE_COLUMNS]))
+
+
+def _input_checks(model):
+    """``(column, known categories or None for a numeric column)`` for every input the model checks."""
+    if isinstance(model, CompiledSVR):
+        return [(column, None) for column in model.num_columns] + list(zip(model.cat_columns, model.cat_values))
+
+    from sklearn.preprocessing import OneHotEncoder, StandardScaler
+
+    checks = []
+    for _, step in getattr(model, 'steps', [])[:-1]:
+        for _, transformer, columns in getattr(step, 'transformers_', []):
+            if isinstance(transformer, StandardScaler):
+                checks += [(column, None) for column in columns]
+            elif isinstance(transformer, OneHotEncoder) and transformer.handle_unknown == 'error':
+                checks += list(zip(columns, transformer.categories_))
+    return checks
+
+
+def validate_rows(pipeline, frame):
+    """
+    Error message per row of ``frame`` ('' when valid) from one vectorized
+    pass over the fitted preprocessing: missing values in scaled columns and
+    categories a one-hot encoder never saw in training.
+    """
+    errors = pd.Series('', index=frame.index, dtype=object)
+    for column, categories in _input_checks(pipeline):
+        unchecked = errors == ''
+        missing = unchecked & frame[column].isna()
+        errors[missing] = f'Missing value in column {column!r}'
+        if categories is not None:
+            bad = unchecked & ~missing & ~frame[column].isin(categories)
+            errors[bad] = ('Found unknown category ' + frame.loc[bad, column].astype(str).map(repr)
+                           + f' in column {column!r}')
+    return errors
+
+
+def score_chunk(pipeline, chunk):
+    """
+    Add the prediction and error columns to ``chunk``. Rows that fail
+    ``validate_rows`` get an error and no price; the rest are scored in one
+    call (one at a time only if the model still rejects them), so a bad row
+    never costs the chunk its vectorized predict.
+    """
+    errors = validate_rows(pipeline, chunk)
+    valid = (errors == '').to_numpy()
+    prices = np.full(len(chunk), np.nan)
+    if valid.any():
+        rows = chunk[valid]
+        try:
+            prices[valid] = predict_frame(pipeline, rows)
+        except ValueError:
+            # Something the checks do not cover: score these rows one at a time
+            for position, i in zip(np.flatnonzero(valid), range(len(rows))):
+                try:
+                    prices[position] = predict_frame(pipeline, rows.iloc[[i]])[0]
+                except ValueError as e:
+                    errors.iloc[position] = str(e)
+    chunk[PREDICTION_COLUMN] = prices
+    chunk[ERROR_COLUMN] = errors.to_numpy()
+    return chunk
+
+
+def read_chunks(source, chunksize=DEFAULT_CHUNKSIZE):
+    reader = pd.read_csv(source, chunksize=chunksize, dtype=INPUT_DTYPES)
+    for chunk in reader:
+        check_columns(chunk.columns)
+        yield chunk
+
+
+# Worker processes load the pipeline once and keep it for every chunk they score
+_worker_pipeline = None
+
+
+def _init_worker(model_path, engine):
+    global _worker_pipeline
+    _worker_pipeline = load_model(model_path, engine)[0].obj
+
+
+def _score_chunk(chunk):
+    return score_chunk(_worker_pipeline, chunk)
+
+
+def iter_scored_chunks(source, model_path=MODEL_PATH, chunksize=DEFAULT_CHUNKSIZE, workers=1, engine='sklearn'):
+    """
+    Yield scored chunks in input order. With ``workers > 1`` chunks are scored
+    in a process pool; at most ``2 * workers`` chunks are in flight at once.
+    """
+    chunks = read_chunks(source, chunksize)
+
+    if workers <= 1:
+        pipeline = load_model(model_path, engine)[0].obj
+        for chunk in chunks:
+            yield score_chunk(pipeline, chunk)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(model_path, engine)) as executor:
+        pending = []
+        for chunk in chunks:
+            pending.append(executor.submit(_score_chunk, chunk))
+            if len(pending) >= 2 * workers:
+                yield pending.pop(0).result()
+        for future in pending:
+            yield future.result()
+
+
+def predict_csv(input_path, output_path, model_path=MODEL_PATH,
+                chunksize=DEFAULT_CHUNKSIZE, workers=1, engine='sklearn'):
+    """
+    Score ``input_path`` into ``output_path``; returns ``(rows written, rows
+    that failed)``. Results go to a temporary file next to the output that is
+    renamed into place on success, so a failed run never leaves a partial file.
+    """
+    rows = failed = 0
+    partial_path = f'{output_path}.partial'
+    try:
+        with open(partial_path, 'w', newline='', encoding='utf-8') as out:
+            for chunk in iter_scored_chunks(input_path, model_path, chunksize, workers, engine):
+                chunk.to_csv(out, header=(rows == 0), index=False)
+                rows += len(chunk)
+                failed += int((chunk[ERROR_COLUMN] != '').sum())
+        os.replace(partial_path, output_path)
+    finally:
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+    return rows, failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Bulk property price estimation')
+    parser.add_argument('input', help='CSV with the 12 predictor columns')
+    parser.add_argument('-o', '--output', help='output CSV (default: <input>_priced.csv)')
+    parser.add_argument('--model', default=MODEL_PATH, help='pickled pipeline')
+    parser.add_argument('--chunksize', type=int, default=DEFAULT_CHUNKSIZE)
+    parser.add_argument('--workers', type=int, default=1,
+                        help='scoring processes (default: 1, in-process)')
+    parser.add_argument('--engine', choices=ENGINES, default='sklearn',
+                        help='compiled: the exported NumPy kernel, if it was exported from --model')
+    args = parser.parse_args()
+
+    output = args.output or f'{os.path.splitext(args.input)[0]}_priced.csv'
+    engine = args.engine
+    if engine == 'compiled' and not kernel_matches(args.model):
+        print(f'No compiled kernel exported from {args.model}; using sklearn')
+        engine = 'sklearn'
+
+    print(f'Scoring {args.input} with {args.model} ({engine}, {args.workers} worker(s))...')
+    start = time.perf_counter()
+    rows, failed = predict_csv(args.input, output, args.model, args.chunksize, args.workers, engine)
+    elapsed = time.perf_counter() - start
+
+    print(f'Wrote {rows:,} predictions to {output}')
+    if failed:
+        print(f'{failed:,} row(s) could not be scored; see the {ERROR_COLUMN} column')
+    print(f'Elapsed: {elapsed:.2f}s ({rows / max(elapsed, 1e-9):,.0f} rows/s)')
+
+
+if __name__ == "__main__":
+    main()
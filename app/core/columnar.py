@@ -0,0 +1,229 @@
+"""
+Columnar binary storage for app datasets
+Each table is a directory of one ``.npy`` file per column plus ``schema.json``.
+Text columns are stored as integer codes with their vocabulary in the
+schema; numeric columns are stored as-is. Reading memory-maps the files, so
+nothing is parsed on startup and processes share the same OS pages.
+
+Every write goes to a fresh build directory that a ``CURRENT`` pointer is
+then swapped to, so files a running dashboard has memory-mapped are never
+rewritten in place. The schema records the size and mtime of the source CSV;
+a table whose source has changed since is treated as absent.
+
+Usage (from the project root):
+    python -m app.core.columnar
+    python -m app.core.columnar --if-stale
+"""
+
+import argparse
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+import pandas as pd
+
+COLUMNAR_DIR = 'app/datasets/columnar'
+SCHEMA_FILE = 'schema.json'
+CURRENT_FILE = 'CURRENT'
+
+
+def table_dir(name, root=COLUMNAR_DIR):
+    return os.path.join(root, name)
+
+
+def current_path(name, root=COLUMNAR_DIR):
+    """Pointer naming the live build of a table; its mtime versions the table."""
+    return os.path.join(table_dir(name, root), CURRENT_FILE)
+
+
+def current_build(directory):
+    """The live build directory of the table at ``directory``."""
+    with open(os.path.join(directory, CURRENT_FILE)) as f:
+        return os.path.join(directory, f.read().strip())
+
+
+def publish_build(directory, build, keep_previous=1):
+    """
+    Point ``directory``'s CURRENT file at the subdirectory ``build`` atomically.
+    The newest ``keep_previous`` superseded builds are kept for readers that
+    resolved the old pointer just before the swap; older ones are removed
+    (open memory maps of removed files stay valid).
+    """
+    tmp = os.path.join(directory, f'{CURRENT_FILE}.{os.getpid()}.tmp')
+    with open(tmp, 'w') as f:
+        f.write(build)
+    os.replace(tmp, os.path.join(directory, CURRENT_FILE))
+
+    superseded = sorted((entry for entry in os.scandir(directory) if entry.is_dir() and entry.name != build),
+                        key=lambda entry: entry.stat().st_mtime_ns, reverse=True)
+    for entry in superseded[keep_previous:]:
+        shutil.rmtree(entry.path, ignore_errors=True)
+
+
+def source_signature(path):
+    """Size and mtime of a source file, recorded with everything built from it."""
+    stat = os.stat(path)
+    return {'file': os.path.basename(path), 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+
+def read_schema(directory):
+    with open(os.path.join(current_build(directory), SCHEMA_FILE)) as f:
+        return json.load(f)
+
+
+def is_fresh(directory, source):
+    """True when the table at ``directory`` exists and was built from ``source`` as it is now."""
+    try:
+        return read_schema(directory).get('source') == source_signature(source)
+    except (OSError, ValueError):
+        return False
+
+
+def _smallest_code_dtype(n_categories):
+    for dtype in (np.int8, np.int16, np.int32):
+        if n_categories < np.iinfo(dtype).max:
+            return dtype
+    return np.int64
+
+
+def _write_frame(df, directory, **schema):
+    """One .npy per column of ``df`` plus the schema, in a new ``directory``."""
+    os.makedirs(directory)
+    columns = []
+    for i, name in enumerate(df.columns):
+        series = df[name]
+        entry = {'name': name, 'file': f'c{i}.npy'}
+        if pd.api.types.is_numeric_dtype(series) and not isinstance(series.dtype, pd.CategoricalDtype):
+            values = series.to_numpy()
+            entry.update(kind='numeric', dtype=values.dtype.name)
+        else:
+            categorical = series.astype('category')
+            categories = categorical.cat.categories
+            codes = categorical.cat.codes.to_numpy().astype(_smallest_code_dtype(len(categories)))
+            values = codes
+            entry.update(kind='category', dtype=codes.dtype.name,
+                         categories=[c.item() if hasattr(c, 'item') else c for c in categories])
+        np.save(os.path.join(directory, entry['file']), np.ascontiguousarray(values))
+        columns.append(entry)
+
+    with open(os.path.join(directory, SCHEMA_FILE), 'w') as f:
+        json.dump({'rows': int(len(df)), 'columns': columns, **schema}, f, indent=1)
+
+
+def write_table(df, directory, source=None, meta=None, arrays=None, tables=None):
+    """
+    Write ``df`` as one .npy per column into a new build under ``directory``
+    and publish it; the index is not stored. ``source`` is the file the
+    frame was read from, checked later by ``is_fresh``. ``meta`` (stored in
+    the schema), extra ``{name: array}`` files and ``{name: frame}`` side
+    tables (read back with ``read_build(os.path.join(build, name))``) are
+    published with the table, so readers never see one without the other.
+    """
+    build = f'{time.time_ns():x}-{os.getpid()}'
+    build_dir = os.path.join(directory, build)
+    schema = {}
+    if source is not None:
+        schema['source'] = source_signature(source)
+    if meta is not None:
+        schema['meta'] = meta
+    _write_frame(df, build_dir, **schema)
+
+    for name, values in (arrays or {}).items():
+        np.save(os.path.join(build_dir, f'{name}.npy'), values)
+    for name, frame in (tables or {}).items():
+        _write_frame(frame, os.path.join(build_dir, name))
+    publish_build(directory, build)
+
+
+def read_table(directory, columns=None, mmap=True):
+    """
+    DataFrame view over the live build of a stored table. Numeric columns
+    stay memory-mapped (read-only); category codes are small and wrapped as
+    pandas Categoricals.
+    """
+    return read_build(current_build(directory), columns, mmap)
+
+
+def read_build(directory, columns=None, mmap=True):
+    """``read_table`` for one resolved build directory."""
+    with open(os.path.join(directory, SCHEMA_FILE)) as f:
+        schema = json.load(f)
+
+    data = {}
+    for entry in schema['columns']:
+        if columns is not None and entry['name'] not in columns:
+            continue
+        values = np.load(os.path.join(directory, entry['file']), mmap_mode='r' if mmap else None)
+        if entry['kind'] == 'category':
+            values = pd.Categorical.from_codes(values, categories=entry['categories'])
+        data[entry['name']] = values
+    return pd.DataFrame(data, copy=False)
+
+
+def load_table_file(pointer_file):
+    """``load_artifact`` loader: open file handle of a table's CURRENT pointer -> DataFrame."""
+    return read_table(os.path.dirname(pointer_file.name))
+
+
+def _sources():
+    from .apartments import APARTMENTS_PATH, TABLES
+    from .viz_data import VIZ_DATA_PATH
+    return {'data_viz1': VIZ_DATA_PATH, **{name: APARTMENTS_PATH for name in TABLES}}
+
+
+def stale_tables(root=COLUMNAR_DIR):
+    """Tables that are missing or older than their source CSV."""
+    return [name for name, source in _sources().items() if not is_fresh(table_dir(name, root), source)]
+
+
+def build_all(root=COLUMNAR_DIR, names=None):
+    """
+    Convert the text datasets the app reads at startup (only the tables in
+    ``names``, when given). Returns {table: rows}.
+    """
+    from .apartments import APARTMENTS_PATH, normalize_apartments, read_apartments_csv
+    from .viz_data import VIZ_DATA_PATH, read_viz_csv
+
+    sources = _sources()
+    names = set(sources if names is None else names)
+    tables = {}
+    if 'data_viz1' in names:
+        tables['data_viz1'] = read_viz_csv(VIZ_DATA_PATH)
+    if names - {'data_viz1'}:
+        # Every other table is normalized out of the one listings CSV
+        tables.update({name: frame for name, frame in normalize_apartments(read_apartments_csv(APARTMENTS_PATH)).items()
+                       if name in names})
+
+    for name, frame in tables.items():
+        write_table(frame, table_dir(name, root), source=sources[name])
+    return {name: len(frame) for name, frame in tables.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the memory-mapped columnar datasets")
+    parser.add_argument('--if-stale', action='store_true',
+                        help="Only rebuild the tables (and cube) that are missing or whose source CSV has changed")
+    args = parser.parse_args()
+
+    from .aggregates import CUBE_DIR, build_and_save, is_current
+    stale = stale_tables() if args.if_stale else None
+    if args.if_stale and not stale and is_current():
+        print('Columnar datasets are up to date')
+        return
+
+    start = time.perf_counter()
+    written = build_all(names=stale)
+    for name, rows in written.items():
+        print(f'{name:24} {rows:>8,} rows -> {table_dir(name)}')
+
+    # The dashboard cube is keyed to data_viz1.csv; listings appended to it are kept
+    if not args.if_stale or not is_current():
+        cube, _, meta = build_and_save()
+        print(f'{"viz_cube":24} {len(cube):>8,} rows -> {CUBE_DIR} ({meta["appended_rows"]:,} appended listings kept)')
+    print(f'Built {len(written)} tables in {time.perf_counter() - start:.2f}s')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Conformal prediction intervals
+Absolute out-of-fold residuals (in log1p price, every training row scored by
+a model that did not see it) are turned into quantiles per sector and
+predicted-price band at training time. At request time an interval is a
+dictionary lookup plus two expm1 calls.
+"""
+
+import json
+import math
+
+import numpy as np
+
+from .model_store import load_artifact
+
+CONFORMAL_PATH = 'app/models/conformal_intervals.json'
+# Residuals differ per model, so the Nystroem model gets its own table
+REDUCED_CONFORMAL_PATH = 'app/models/conformal_intervals_reduced.json'
+LEVELS = [0.8, 0.9, 0.95]
+N_BANDS = 4
+MIN_COUNT = 20
+
+
+def conformal_quantile(residuals, level):
+    """Finite-sample corrected quantile: the ceil((n + 1) * level)-th smallest residual."""
+    residuals = np.sort(np.asarray(residuals))
+    n = len(residuals)
+    rank = min(math.ceil((n + 1) * level), n)
+    return float(residuals[rank - 1])
+
+
+def _quantiles(residuals, levels):
+    return {str(level): conformal_quantile(residuals, level) for level in levels}
+
+
+def build_table(y_true, y_pred, sectors, levels=LEVELS, n_bands=N_BANDS, min_count=MIN_COUNT):
+    """
+    ``y_true``/``y_pred`` are log1p prices, with ``y_pred`` out of fold (or on
+    a held-out calibration set). Strata with
+    fewer than ``min_count`` residuals are left out; lookups fall back from
+    sector and band, to sector, to band, to the global quantiles.
+    """
+    y_true, y_pred = np.asarray(y_true), np.asarray(y_pred)
+    sectors = np.asarray(sectors, dtype=str)
+    residuals = np.abs(y_true - y_pred)
+
+    # Interior band edges at quantiles of the predicted price
+    band_edges = np.quantile(y_pred, np.linspace(0, 1, n_bands + 1)[1:-1])
+    bands = np.searchsorted(band_edges, y_pred)
+
+    table = {
+        'levels': list(levels),
+        'band_edges': band_edges.tolist(),
+        'calibration_rows': int(len(residuals)),
+        'global': _quantiles(residuals, levels),
+        'by_band': {},
+        'by_sector': {},
+        'by_sector_band': {},
+    }
+    for band in range(n_bands):
+        mask = bands == band
+        if mask.sum() >= min_count:
+            table['by_band'][str(band)] = _quantiles(residuals[mask], levels)
+    for sector in np.unique(sectors):
+        if (sectors == sector).sum() >= min_count:
+            table['by_sector'][sector] = _quantiles(residuals[sectors == sector], levels)
+        for band in range(n_bands):
+            mask = (sectors == sector) & (bands == band)
+            if mask.sum() >= min_count:
+                table['by_sector_band'][f'{sector}|{band}'] = _quantiles(residuals[mask], levels)
+    return table
+
+
+STRATUM_LABELS = {
+    'sector_band': '{sector} listings in this price band',
+    'sector': '{sector} listings',
+    'band': 'listings in this price band across all sectors',
+    'global': 'all listings',
+}
+
+
+def stratum_label(stratum, sector):
+    """Plain-language description of the residuals an interval came from."""
+    return STRATUM_LABELS[stratum].format(sector=sector)
+
+
+class ConformalTable:
+
+    def __init__(self, table):
+        self.table = table
+        self.levels = table['levels']
+        self.band_edges = np.asarray(table['band_edges'])
+
+    def radius(self, log_pred, sector, level):
+        """Half-width in log1p space and the stratum it came from."""
+        band = str(int(np.searchsorted(self.band_edges, log_pred)))
+        for stratum, key in [('sector_band', f'{sector}|{band}'), ('sector', sector), ('band', band)]:
+            quantiles = self.table[f'by_{stratum}'].get(key)
+            if quantiles is not None:
+                return quantiles[str(level)], stratum
+        return self.table['global'][str(level)], 'global'
+
+    def interval(self, price, sector, level=0.9):
+        """``(low, high, stratum)`` in Cr for a predicted price in Cr."""
+        log_pred = math.log1p(price)
+        radius, stratum = self.radius(log_pred, sector, level)
+        return max(math.expm1(log_pred - radius), 0.0), math.expm1(log_pred + radius), stratum
+
+
+def read_conformal(file):
+    """``load_artifact`` loader: open JSON table file -> ConformalTable."""
+    return ConformalTable(json.load(file))
+
+
+def load_conformal(path=CONFORMAL_PATH):
+    """The shared ConformalTable for ``path``, loaded once per process and reloaded when the file changes."""
+    return load_artifact(path, loader=read_conformal).obj
+
+
+def write_table(table, path=CONFORMAL_PATH):
+    with open(path, 'w') as f:
+        json.dump(table, f, indent=2)
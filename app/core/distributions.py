@@ -0,0 +1,116 @@
+"""
+Server-side distribution summaries for the Analytics Dashboard
+Box, violin and histogram charts are drawn from per-group statistics
+computed here (quartiles, Tukey whiskers, a capped outlier sample, binned
+KDE curves) instead of shipping every row to the browser; box and violin
+results are memoized per data version and filter. Histograms are summed from
+the aggregate cube's stored bins, so they never revisit listing rows.
+"""
+
+import numpy as np
+import pandas as pd
+
+from .aggregates import HIST_BINS, hist_matrix, sketch_edges, sketch_matrix
+from .viz_data import memoize_on_version
+
+MAX_OUTLIERS = 40
+KDE_BINS = 256
+KDE_POINTS = 80
+
+
+def box_summary(values, groups, max_outliers=MAX_OUTLIERS, seed=0):
+    """
+    Per-group box statistics. Returns ``(stats, outliers)``: ``stats`` is
+    indexed by group with count, q1, median, q3, lower/upper whisker
+    (Tukey, 1.5 IQR) and n_outliers; ``outliers`` holds at most
+    ``max_outliers`` sampled points per group. No values give empty stats.
+    """
+    values = pd.Series(np.asarray(values, dtype=np.float64), index=np.asarray(groups))
+    grouped = values.groupby(level=0, sort=True)
+    quartiles = grouped.quantile([0.25, 0.5, 0.75]).unstack().reindex(columns=[0.25, 0.5, 0.75])
+    stats = pd.DataFrame({'count': grouped.size(), 'q1': quartiles[0.25],
+                          'median': quartiles[0.5], 'q3': quartiles[0.75]})
+    iqr = stats['q3'] - stats['q1']
+    low_fence = (stats['q1'] - 1.5 * iqr).reindex(values.index).to_numpy()
+    high_fence = (stats['q3'] + 1.5 * iqr).reindex(values.index).to_numpy()
+
+    inside = (values >= low_fence) & (values <= high_fence)
+    stats['lower'] = values[inside].groupby(level=0).min()
+    stats['upper'] = values[inside].groupby(level=0).max()
+
+    outliers = values[~inside]
+    stats['n_outliers'] = outliers.groupby(level=0).size().reindex(stats.index, fill_value=0)
+    if len(outliers):
+        shuffled = outliers.iloc[np.random.default_rng(seed).permutation(len(outliers))]
+        rank = shuffled.groupby(level=0).cumcount().to_numpy()
+        outliers = shuffled[rank < max_outliers].sort_index(kind='stable')
+    return stats, outliers.rename_axis('group').rename('value').reset_index()
+
+
+def binned_kde(values, low, high, bins=KDE_BINS, points=KDE_POINTS):
+    """
+    Gaussian KDE (Scott bandwidth) evaluated on ``points`` between low and
+    high, via a histogram convolved with the kernel: O(rows + bins^2).
+    """
+    values = np.asarray(values, dtype=np.float64)
+    if len(values) < 2 or high <= low:
+        return np.linspace(low, high, points), np.zeros(points)
+    span = values.max() - values.min()
+    bandwidth = max(values.std() * len(values) ** -0.2, span / bins, 1e-9)
+    edges = np.linspace(values.min() - 3 * bandwidth, values.max() + 3 * bandwidth, bins + 1)
+    counts, _ = np.histogram(values, bins=edges)
+    centers = (edges[:-1] + edges[1:]) / 2
+    grid = np.linspace(low, high, points)
+    kernel = np.exp(-0.5 * ((grid[:, None] - centers[None, :]) / bandwidth) ** 2)
+    density = kernel @ counts / (len(values) * bandwidth * np.sqrt(2 * np.pi))
+    return grid, density
+
+
+def _filter(df, sector):
+    return df if sector is None else df[df['sector'] == sector]
+
+
+@memoize_on_version
+def price_box_stats(df, sector=None, by='bedRoom', value='price'):
+    """Box statistics of ``value`` per ``by`` group, for one sector or all (None)."""
+    rows = _filter(df, sector)
+    return box_summary(rows[value].to_numpy(), rows[by].to_numpy(np.float64))
+
+
+@memoize_on_version
+def price_violins(df, sector=None, by='bedRoom', value='price'):
+    """{group: (grid, density)} spanning each group's whiskers."""
+    rows = _filter(df, sector)
+    stats, _ = box_summary(rows[value].to_numpy(), rows[by].to_numpy(np.float64), max_outliers=0)
+    groups = rows[by].to_numpy(np.float64)
+    order = np.argsort(groups, kind='stable')
+    values = rows[value].to_numpy(np.float64)[order]
+    bounds = np.searchsorted(groups[order], stats.index.to_numpy(np.float64), side='right')
+    starts = np.r_[0, bounds[:-1]]
+    return {group: binned_kde(values[start:end], stats.at[group, 'lower'], stats.at[group, 'upper'])
+            for group, start, end in zip(stats.index, starts, bounds)}
+
+
+def _merge_log_bins(counts, edges, bins):
+    """Trim the sketch to its occupied buckets and merge runs of them into at most ``bins`` bars."""
+    occupied = np.flatnonzero(counts.sum(axis=0))
+    if not len(occupied):
+        return counts[:, :0], edges[:1]
+    first, last = occupied[0], occupied[-1] + 1
+    starts = np.arange(first, last, -(-(last - first) // bins))
+    return np.add.reduceat(counts, starts, axis=1), np.r_[edges[starts], edges[last]]
+
+
+def price_histograms(cube, edges, by='property_type', log=False, bins=HIST_BINS):
+    """
+    ``(edges, {group: counts})`` summed over the aggregate cube, with edges
+    shared by all groups so the bars overlay bin for bin. Linear bins are the
+    cube's own histogram; log bins are its geometric quantile-sketch buckets
+    merged to about ``bins`` bars.
+    """
+    if log:
+        counts, edges = _merge_log_bins(sketch_matrix(cube), sketch_edges(), bins)
+    else:
+        counts = hist_matrix(cube)
+    grouped = pd.DataFrame(counts).groupby(cube[by].to_numpy(), sort=True).sum()
+    return edges, {group: grouped.loc[group].to_numpy() for group in grouped.index}
@@ -0,0 +1,124 @@
+"""
+Geomap layers for the Analytics Dashboard
+Sector centroids come from the aggregate cube as typed arrays; the hex layer
+bins listing coordinates into a hexagonal grid (vectorized axial-coordinate
+rounding) and averages price per sqft per cell. Finished figure specs are
+memoized per data (and cube) version, so reruns only re-send a cached dict.
+"""
+
+import numpy as np
+import plotly.express as px
+import plotly.graph_objects as go
+
+from .aggregates import memoize_on_cube, rollup
+from .viz_data import memoize_on_version
+
+HEX_SIZES = {'~0.5 km': 0.0025, '~1 km': 0.005, '~2 km': 0.01}
+MAP_CENTER_ZOOM = 10
+MAP_HEIGHT = 700
+
+
+def sector_centroids(cube):
+    """
+    {'sector', 'latitude', 'longitude', 'price_per_sqft', 'built_up_area',
+    'count', 'price_q25', 'price_q50', 'price_q75'} arrays; the price
+    quartiles come from the cube's quantile sketch.
+    """
+    sectors = rollup(cube, 'sector')
+    layer = {column: sectors[column].to_numpy(np.float32)
+             for column in ['latitude', 'longitude', 'price_per_sqft', 'built_up_area',
+                            'price_q25', 'price_q50', 'price_q75']}
+    layer['count'] = sectors['count'].to_numpy(np.int64)
+    layer['sector'] = sectors.index.to_numpy(str)
+    return layer
+
+
+def hex_bins(latitude, longitude, values, size):
+    """
+    Aggregate points into pointy-top hexagons of circumradius ``size``
+    (degrees of latitude). Longitude is scaled by cos(mean latitude) so cells
+    are regular on the map. Returns (q, r, count, mean value) per occupied cell.
+    """
+    latitude = np.asarray(latitude, dtype=np.float64)
+    scale = np.cos(np.radians(latitude.mean()))
+    x = np.asarray(longitude, dtype=np.float64) * scale
+    y = latitude
+
+    # Fractional axial coordinates, then cube rounding
+    q = (np.sqrt(3) / 3 * x - y / 3) / size
+    r = (2 / 3 * y) / size
+    s = -q - r
+    rq, rr, rs = np.round(q), np.round(r), np.round(s)
+    dq, dr, ds = np.abs(rq - q), np.abs(rr - r), np.abs(rs - s)
+    fix_q = (dq > dr) & (dq > ds)
+    fix_r = ~fix_q & (dr > ds)
+    rq = np.where(fix_q, -rr - rs, rq)
+    rr = np.where(fix_r, -rq - rs, rr)
+
+    # One int64 key per cell so grouping is a 1-D unique
+    rq, rr = rq.astype(np.int64), rr.astype(np.int64)
+    q0, r0 = rq.min(), rr.min()
+    width = rr.max() - r0 + 1
+    keys, inverse = np.unique((rq - q0) * width + (rr - r0), return_inverse=True)
+    count = np.bincount(inverse)
+    mean = np.bincount(inverse, weights=np.asarray(values, dtype=np.float64)) / count
+    return keys // width + q0, keys % width + r0, count, mean, scale
+
+
+def hex_geojson(q, r, size, scale):
+    """GeoJSON FeatureCollection of hexagon polygons with ids '0'..'n-1'."""
+    center_x = size * np.sqrt(3) * (q + r / 2)
+    center_y = size * 1.5 * r
+    angles = np.radians(60 * np.arange(6) - 30)
+    lon = (center_x[:, None] + size * np.cos(angles)[None, :]) / scale
+    lat = center_y[:, None] + size * np.sin(angles)[None, :]
+    rings = np.stack([lon, lat], axis=2).round(6)
+    features = [{'type': 'Feature', 'id': str(i),
+                 'geometry': {'type': 'Polygon', 'coordinates': [ring.tolist() + [ring[0].tolist()]]}}
+                for i, ring in enumerate(rings)]
+    return {'type': 'FeatureCollection', 'features': features}
+
+
+def sector_figure(layer):
+    fig = px.scatter_map(lat=layer['latitude'], lon=layer['longitude'], color=layer['price_per_sqft'],
+                         size=layer['built_up_area'], hover_name=layer['sector'],
+                         color_continuous_scale=px.colors.cyclical.IceFire, zoom=MAP_CENTER_ZOOM,
+                         map_style="open-street-map", height=MAP_HEIGHT,
+                         labels={'color': 'price_per_sqft', 'size': 'built_up_area'})
+    fig.update_traces(
+        customdata=np.stack([layer['count'], layer['price_q50'], layer['price_q25'], layer['price_q75']], axis=1),
+        hovertemplate='<b>%{hovertext}</b><br>₹%{marker.color:,.0f}/sqft<br>%{customdata[0]:,} listings<br>'
+                      'Median ₹%{customdata[1]:.2f} Cr (IQR ₹%{customdata[2]:.2f}-%{customdata[3]:.2f} Cr)'
+                      '<extra></extra>')
+    return fig
+
+
+def hex_figure(df, size):
+    q, r, count, mean, scale = hex_bins(df['latitude'].to_numpy(), df['longitude'].to_numpy(),
+                                        df['price_per_sqft'].to_numpy(), size)
+    fig = go.Figure(go.Choroplethmap(
+        geojson=hex_geojson(q, r, size, scale), locations=[str(i) for i in range(len(q))],
+        z=mean, customdata=count, colorscale=px.colors.cyclical.IceFire, marker_opacity=0.6,
+        marker_line_width=0.5, colorbar={'title': 'price_per_sqft'},
+        hovertemplate='₹%{z:,.0f}/sqft<br>%{customdata} listings<extra></extra>'))
+    fig.update_layout(map={'style': 'open-street-map', 'zoom': MAP_CENTER_ZOOM,
+                           'center': {'lat': float(df['latitude'].mean()), 'lon': float(df['longitude'].mean())}},
+                      height=MAP_HEIGHT, margin={'l': 0, 'r': 0, 't': 0, 'b': 0})
+    return fig
+
+
+def geomap_spec(viz_data, layer='sectors', hex_size=None):
+    """Plotly figure dict for the requested layer, built once per data version."""
+    if layer == 'hex':
+        return _hex_spec(viz_data, hex_size)
+    return _sector_spec(viz_data)
+
+
+@memoize_on_cube
+def _sector_spec(cube):
+    return sector_figure(sector_centroids(cube)).to_dict()
+
+
+@memoize_on_version
+def _hex_spec(df, hex_size):
+    return hex_figure(df, hex_size).to_dict()
@@ -0,0 +1,112 @@
+"""
+Model manifest
+A small JSON file written next to the model with everything the Price
+Predictor form needs (category vocabularies, numeric ranges, feature schema,
+training row count and the model file hash), so the page never has to load
+the full training frame.
+
+Usage (from the project root, to rebuild from existing artifacts):
+    python -m app.core.manifest
+"""
+
+import argparse
+import functools
+import hashlib
+import json
+import os
+import pickle
+
+from .batch_predict import FEATURE_COLUMNS
+from .model_store import DF_PATH, MODEL_PATH, load_artifact
+
+MANIFEST_PATH = 'app/models/model_manifest.json'
+
+# Columns offered as selectboxes on the form
+CATEGORY_COLUMNS = ['property_type', 'sector', 'bedRoom', 'bathroom', 'balcony', 'agePossession',
+                    'servant room', 'store room', 'furnishing_type', 'luxury_category', 'floor_category']
+RANGE_COLUMNS = ['bedRoom', 'bathroom', 'built_up_area', 'price']
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _plain(value):
+    # numpy scalars -> built-in types for JSON
+    return value.item() if hasattr(value, 'item') else value
+
+
+def build_manifest(df, model_path=None):
+    manifest = {
+        'training_rows': int(len(df)),
+        'features': [{'name': c, 'dtype': str(df[c].dtype)} for c in FEATURE_COLUMNS],
+        'target': 'price',
+        'categories': {c: [_plain(v) for v in sorted(df[c].unique())] for c in CATEGORY_COLUMNS},
+        'ranges': {
+            c: {'min': float(df[c].min()), 'max': float(df[c].max()), 'median': float(df[c].median())}
+            for c in RANGE_COLUMNS if c in df
+        },
+    }
+    if model_path is not None:
+        manifest['model'] = {'file': os.path.basename(model_path), 'sha256': file_sha256(model_path)}
+    return manifest
+
+
+def write_manifest(manifest, path=MANIFEST_PATH):
+    with open(path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+
+
+def _manifest_from_frame(file):
+    return build_manifest(pickle.load(file))
+
+
+def load_manifest(path=MANIFEST_PATH, df_path=DF_PATH):
+    """
+    The manifest for the deployed model. Falls back to deriving it from the
+    training frame when no manifest has been written yet.
+    """
+    if os.path.exists(path):
+        return load_artifact(path, loader=json.load).obj
+    return load_artifact(df_path, loader=_manifest_from_frame).obj
+
+
+@functools.lru_cache(maxsize=8)
+def _artifact_sha256(path, version):
+    # Hashed once per file version, not on every page rerun
+    return file_sha256(path)
+
+
+def check_model(manifest, artifact):
+    """
+    ``None`` when the manifest was written for the loaded model ``artifact``
+    (or does not describe that file), otherwise a message explaining the
+    mismatch.
+    """
+    recorded = manifest.get('model')
+    if recorded is None or recorded['file'] != os.path.basename(artifact.path):
+        return None
+    if _artifact_sha256(artifact.path, artifact.version) != recorded['sha256']:
+        return (f"{recorded['file']} has changed since the model manifest was written, so the form "
+                f"options may not match the model. Rebuild it with: python -m app.core.manifest")
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Write the model manifest')
+    parser.add_argument('--model', default=MODEL_PATH)
+    parser.add_argument('--data', default=DF_PATH, help='pickled training frame')
+    parser.add_argument('--output', default=MANIFEST_PATH)
+    args = parser.parse_args()
+
+    manifest = build_manifest(load_artifact(args.data).obj, args.model)
+    write_manifest(manifest, args.output)
+    print(f'Wrote manifest for {manifest["training_rows"]:,} training rows to {args.output}')
+
+
+if __name__ == "__main__":
+    main()
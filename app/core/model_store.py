@@ -0,0 +1,110 @@
+"""
+Process-wide artifact store
+Pickled models and frames are loaded once per server process and shared
+read-only by every session. An entry is reloaded when its file changes on disk.
+"""
+
+import os
+import pickle
+import threading
+import time
+from dataclasses import dataclass
+
+MODEL_PATH = 'app/models/pipeline.pkl'
+DF_PATH = 'app/models/df.pkl'
+
+
+@dataclass(frozen=True)
+class Artifact:
+    """A loaded artifact plus the bookkeeping used for invalidation and reporting."""
+    obj: object
+    path: str
+    mtime_ns: int
+    file_bytes: int
+    memory_bytes: int
+    load_seconds: float
+
+    @property
+    def version(self):
+        # Changes whenever the file on disk is replaced
+        return f'{os.path.basename(self.path)}@{self.mtime_ns}:{self.file_bytes}'
+
+
+_lock = threading.Lock()
+_artifacts = {}
+
+
+def _file_signature(path):
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _memory_bytes(obj, file_bytes):
+    # Sized from the loaded object rather than by tracing allocations, which
+    # slows unpickling several-fold and also counts other threads' allocations
+    if hasattr(obj, 'memory_usage'):
+        usage = obj.memory_usage(deep=True)
+        return int(usage.sum() if hasattr(usage, 'sum') else usage)
+    if hasattr(obj, 'nbytes'):
+        return int(obj.nbytes)
+    return file_bytes
+
+
+def _load(path, loader):
+    mtime_ns, file_bytes = _file_signature(path)
+    start = time.perf_counter()
+    with open(path, 'rb') as file:
+        obj = loader(file)
+    load_seconds = time.perf_counter() - start
+    return Artifact(obj=obj, path=path, mtime_ns=mtime_ns, file_bytes=file_bytes,
+                    memory_bytes=_memory_bytes(obj, file_bytes), load_seconds=load_seconds)
+
+
+def _loader_key(loader):
+    # Named by module and qualified name, so a loader redefined on every page
+    # rerun still maps to the same entry while different loaders never collide
+    return getattr(loader, '__module__', None), getattr(loader, '__qualname__', repr(loader))
+
+
+def load_artifact(path, loader=pickle.load):
+    """
+    Return the shared Artifact for ``path`` as read by ``loader``, (re)loading
+    it only when the pair is new to this process or the file has changed since
+    it was last loaded. Callers must treat ``artifact.obj`` as read-only.
+    """
+    path = os.path.abspath(path)
+    key = (path, _loader_key(loader))
+    signature = _file_signature(path)
+
+    cached = _artifacts.get(key)
+    if cached is not None and (cached.mtime_ns, cached.file_bytes) == signature:
+        return cached
+
+    with _lock:
+        # Another thread may have finished the reload while we waited
+        cached = _artifacts.get(key)
+        if cached is not None and (cached.mtime_ns, cached.file_bytes) == _file_signature(path):
+            return cached
+        artifact = _load(path, loader)
+        _artifacts[key] = artifact
+        return artifact
+
+
+def artifact_stats():
+    """Load time and size of every artifact currently held by this process."""
+    return [
+        {
+            'artifact': os.path.relpath(a.path),
+            'version': a.version,
+            'load_ms': round(a.load_seconds * 1000, 1),
+            'file_mb': round(a.file_bytes / 1e6, 2),
+            'memory_mb': round(a.memory_bytes / 1e6, 2),
+        }
+        for a in list(_artifacts.values())
+    ]
+
+
+def clear():
+    """Drop every cached artifact (mainly for scripts and tests)."""
+    with _lock:
+        _artifacts.clear()
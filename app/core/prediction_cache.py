@@ -0,0 +1,123 @@
+"""
+Process-wide LRU cache for single-listing price predictions
+The predictor inputs are mostly small categorical choices, so identical
+queries repeat across sessions. Entries are keyed on the normalized input
+tuple plus the model version, expire after a TTL and are evicted LRU-first.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+from .batch_predict import FEATURE_COLUMNS, INPUT_DTYPES
+
+DEFAULT_MAXSIZE = 4096
+DEFAULT_TTL_SECONDS = 3600
+
+
+def normalize_row(row):
+    """
+    The listing with every predictor field cast to its training dtype and text
+    stripped, so 3 and 3.0 bedrooms (or ' flat' and 'flat') are the same row.
+    Callers predict on this row as well as keying on it, so a cache hit and a
+    miss always see the same input. Raises ValueError naming the field when a
+    value is null or cannot be cast.
+    """
+    normalized = {}
+    for column in FEATURE_COLUMNS:
+        if row[column] is None:
+            raise ValueError(f'field {column!r} must not be null')
+        try:
+            value = INPUT_DTYPES[column](row[column])
+        except (TypeError, ValueError):
+            raise ValueError(f'field {column!r} has invalid value {row[column]!r}') from None
+        if isinstance(value, str):
+            value = value.strip()
+        normalized[column] = value
+    return normalized
+
+
+def normalize_key(row, model_version):
+    """Hashable key for a listing already passed through ``normalize_row``."""
+    return (model_version, tuple(row[column] for column in FEATURE_COLUMNS))
+
+
+class PredictionCache:
+    """Thread-safe LRU + TTL cache with hit/miss/eviction counters."""
+
+    def __init__(self, maxsize=DEFAULT_MAXSIZE, ttl=DEFAULT_TTL_SECONDS):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, stored_at = entry
+            if time.monotonic() - stored_at > self.ttl:
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.evictions = self.expirations = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'maxsize': self.maxsize,
+                'ttl_s': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+            }
+
+
+_cache = PredictionCache()
+
+
+def get_cache():
+    """The cache shared by every session in this process."""
+    return _cache
+
+
+def cached_predict(predict_one, row, model_version, cache=None):
+    """
+    Return ``(price, hit)`` for ``row``, calling ``predict_one`` on the
+    normalized row only on a miss. ``predict_one`` must return the final price.
+    """
+    cache = cache or _cache
+    row = normalize_row(row)
+    key = normalize_key(row, model_version)
+    price = cache.get(key)
+    if price is not None:
+        return price, True
+    price = predict_one(row)
+    cache.put(key, price)
+    return price, False
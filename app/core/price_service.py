@@ -0,0 +1,252 @@
+"""
+Price prediction HTTP service
+Loads the pipeline once and serves JSON predictions. Requests that arrive
+within a few milliseconds of each other are coalesced into a single batched
+``predict`` call; latency percentiles are exposed on /metrics.
+
+Usage (from the project root):
+    python -m app.core.price_service --port 8600
+    python -m app.core.price_service --engine compiled   # exported NumPy kernel, see svr_kernel
+
+Endpoints:
+    POST /predict   one listing object, or a list of them, with the 12 predictor fields
+    GET  /metrics   request count, batch sizes, p50/p99 latency (ms) and cache stats
+    GET  /health    model version
+"""
+
+import argparse
+import json
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, TimeoutError as ResultTimeout
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import pandas as pd
+
+from .batch_predict import FEATURE_COLUMNS, predict_frame
+from .model_store import MODEL_PATH
+from .prediction_cache import get_cache, normalize_key, normalize_row
+from .svr_kernel import ENGINES, load_model
+
+
+class LatencyStats:
+    """Rolling window of request latencies plus running counters."""
+
+    def __init__(self, window=10000):
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=window)
+        self._batch_sizes = deque(maxlen=window)
+        self.requests = 0
+        self.errors = 0
+
+    def record_request(self, seconds, ok=True):
+        with self._lock:
+            self._latencies.append(seconds * 1000)
+            self.requests += 1
+            if not ok:
+                self.errors += 1
+
+    def record_batch(self, size):
+        with self._lock:
+            self._batch_sizes.append(size)
+
+    def snapshot(self):
+        with self._lock:
+            latencies = np.array(self._latencies)
+            batch_sizes = np.array(self._batch_sizes)
+            requests, errors = self.requests, self.errors
+
+        summary = {'requests': requests, 'errors': errors, 'batches': int(batch_sizes.size)}
+        if latencies.size:
+            summary.update({
+                'p50_ms': round(float(np.percentile(latencies, 50)), 3),
+                'p99_ms': round(float(np.percentile(latencies, 99)), 3),
+                'max_ms': round(float(latencies.max()), 3),
+            })
+        if batch_sizes.size:
+            summary['mean_batch_size'] = round(float(batch_sizes.mean()), 2)
+        return summary
+
+
+class MicroBatcher:
+    """
+    Collects single-row requests on a queue and scores them in batches.
+    A batch closes when ``max_batch`` rows are waiting or ``max_wait_ms`` has
+    passed since its first row arrived.
+    """
+
+    def __init__(self, pipeline, stats, max_batch=64, max_wait_ms=5.0):
+        self.pipeline = pipeline
+        self.stats = stats
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name='micro-batcher', daemon=True)
+        self._thread.start()
+
+    def submit(self, row):
+        future = Future()
+        self._queue.put((row, future))
+        return future
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            self.stats.record_batch(len(batch))
+            try:
+                self._score(batch)
+            except Exception as e:
+                # Nothing may kill the worker thread: fail this batch and keep serving
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+
+    def _score(self, batch):
+        try:
+            frame = pd.DataFrame([row for row, _ in batch], columns=FEATURE_COLUMNS)
+            prices = predict_frame(self.pipeline, frame)
+        except Exception:
+            # One bad row (e.g. an unseen sector) must not fail its neighbours
+            self._score_individually(batch)
+            return
+        for (_, future), price in zip(batch, prices):
+            future.set_result(float(price))
+
+    def _score_individually(self, batch):
+        for row, future in batch:
+            try:
+                frame = pd.DataFrame([row], columns=FEATURE_COLUMNS)
+                future.set_result(float(predict_frame(self.pipeline, frame)[0]))
+            except Exception as e:
+                future.set_exception(e)
+
+
+def parse_listing(obj):
+    if not isinstance(obj, dict):
+        raise ValueError('each listing must be a JSON object')
+    missing = [c for c in FEATURE_COLUMNS if c not in obj]
+    if missing:
+        raise ValueError(f'missing fields: {missing}')
+    # Cast to the training dtypes (balcony is text: '0'..'3', '3+'); the same
+    # row is used for the cache key and for the model
+    return normalize_row(obj)
+
+
+def make_handler(batcher, stats, model_version, timeout=30.0):
+    cache = get_cache()
+
+    class PriceRequestHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def _send_json(self, status, payload):
+            body = json.dumps(payload).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path == '/metrics':
+                self._send_json(200, dict(stats.snapshot(), cache=cache.stats()))
+            elif self.path == '/health':
+                self._send_json(200, {'status': 'ok', 'model': model_version})
+            else:
+                self._send_json(404, {'error': 'not found'})
+
+        def do_POST(self):
+            if self.path != '/predict':
+                self._send_json(404, {'error': 'not found'})
+                return
+
+            start = time.perf_counter()
+            try:
+                length = int(self.headers.get('Content-Length', 0))
+                payload = json.loads(self.rfile.read(length) or b'null')
+                many = isinstance(payload, list)
+                rows = [parse_listing(obj) for obj in (payload if many else [payload])]
+
+                # Repeated listings skip the model; only misses go to the batcher
+                keys = [normalize_key(row, model_version) for row in rows]
+                prices = [cache.get(key) for key in keys]
+                futures = {i: batcher.submit(row) for i, row in enumerate(rows) if prices[i] is None}
+                for i, future in futures.items():
+                    prices[i] = future.result(timeout=timeout)
+                    cache.put(keys[i], prices[i])
+            except ResultTimeout:
+                stats.record_request(time.perf_counter() - start, ok=False)
+                self._send_json(503, {'error': f'prediction timed out after {timeout:.0f}s'})
+                return
+            except ValueError as e:
+                # Malformed JSON, missing fields or values the model does not know
+                stats.record_request(time.perf_counter() - start, ok=False)
+                self._send_json(400, {'error': str(e)})
+                return
+            except Exception as e:
+                stats.record_request(time.perf_counter() - start, ok=False)
+                self._send_json(500, {'error': str(e)})
+                return
+
+            stats.record_request(time.perf_counter() - start)
+            self._send_json(200, {'prices': prices} if many else {'price': prices[0]})
+
+        def log_message(self, format, *args):
+            # Per-request access logs would dominate latency at high request rates
+            pass
+
+    return PriceRequestHandler
+
+
+class PriceServer(ThreadingHTTPServer):
+    # The socketserver default backlog of 5 resets connections under bursts
+    request_queue_size = 256
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Price prediction HTTP service')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8600)
+    parser.add_argument('--model', default=MODEL_PATH, help='pickled pipeline')
+    parser.add_argument('--engine', choices=ENGINES, default='sklearn',
+                        help='compiled: the exported NumPy kernel, if it was exported from --model')
+    parser.add_argument('--max-batch', type=int, default=64)
+    parser.add_argument('--max-wait-ms', type=float, default=5.0)
+    args = parser.parse_args()
+
+    artifact, engine = load_model(args.model, args.engine)
+    if engine != args.engine:
+        print(f'No compiled kernel exported from {args.model}; using sklearn')
+    print(f'Loaded {os.path.relpath(artifact.path)} ({engine}) in {artifact.load_seconds * 1000:.0f} ms')
+
+    stats = LatencyStats()
+    batcher = MicroBatcher(artifact.obj, stats, args.max_batch, args.max_wait_ms)
+    server = PriceServer((args.host, args.port), make_handler(batcher, stats, artifact.version))
+
+    print(f'Serving predictions on http://{args.host}:{args.port}/predict')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print('\nService stopped by user')
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
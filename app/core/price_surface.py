@@ -0,0 +1,136 @@
+"""
+Precomputed price surface for what-if exploration
+The pipeline is evaluated once over a grid of the inputs users nudge most
+(sector x property type x bedrooms x furnishing x luxury x built-up area);
+the remaining inputs are fixed to the most common value for that property
+type and bedroom count. Lookups index the array directly and interpolate
+along area, so they take microseconds. Exact quotes still use the model.
+
+Usage (from the project root):
+    python -m app.core.price_surface --area-points 32
+"""
+
+import argparse
+import time
+from itertools import product
+
+import numpy as np
+import pandas as pd
+
+from .batch_predict import FEATURE_COLUMNS, INPUT_DTYPES
+from .model_store import DF_PATH, MODEL_PATH, load_artifact
+
+SURFACE_PATH = 'app/models/price_surface.npz'
+SURFACE_AXES = ['sector', 'property_type', 'bedRoom', 'furnishing_type', 'luxury_category']
+AREA_POINTS = 32
+CHUNK_ROWS = 20000
+
+# Inputs not on the grid take the most common value for (property_type, bedRoom)
+REFERENCE_COLUMNS = [c for c in FEATURE_COLUMNS if c not in SURFACE_AXES + ['built_up_area']]
+
+
+def reference_values(df):
+    overall = {c: df[c].mode().iloc[0] for c in REFERENCE_COLUMNS}
+    by_group = {}
+    for (property_type, bedrooms), group in df.groupby(['property_type', 'bedRoom']):
+        by_group[(property_type, float(bedrooms))] = {c: group[c].mode().iloc[0] for c in REFERENCE_COLUMNS}
+    return by_group, overall
+
+
+def area_grid(df, points=AREA_POINTS):
+    low, high = df['built_up_area'].quantile([0.005, 0.995])
+    return np.geomspace(max(low, 100.0), min(high, 10000.0), points)
+
+
+def build_surface(pipeline, df, points=AREA_POINTS, chunk_rows=CHUNK_ROWS):
+    """Evaluate ``pipeline`` over the grid; returns the .npz arrays (log1p prices)."""
+    axes = {c: np.array(sorted(df[c].unique())) for c in SURFACE_AXES}
+    areas = area_grid(df, points)
+    by_group, overall = reference_values(df)
+
+    combos = list(product(*(axes[c] for c in SURFACE_AXES)))
+    grid = pd.DataFrame(np.repeat(np.array(combos, dtype=object), len(areas), axis=0), columns=SURFACE_AXES)
+    grid['built_up_area'] = np.tile(areas, len(combos))
+
+    reference = pd.DataFrame([
+        by_group.get((p, float(b)), overall)
+        for p, b in zip(grid['property_type'], grid['bedRoom'])
+    ])
+    for column in REFERENCE_COLUMNS:
+        grid[column] = reference[column].to_numpy()
+    grid = grid[FEATURE_COLUMNS].astype(INPUT_DTYPES)
+
+    log_prices = np.empty(len(grid), dtype=np.float32)
+    for start in range(0, len(grid), chunk_rows):
+        log_prices[start:start + chunk_rows] = pipeline.predict(grid.iloc[start:start + chunk_rows])
+
+    shape = tuple(len(axes[c]) for c in SURFACE_AXES) + (len(areas),)
+    arrays = {f'axis_{c}': values.astype(float if values.dtype.kind in 'fiu' else str) for c, values in axes.items()}
+    arrays['area'] = areas
+    arrays['log_price'] = log_prices.reshape(shape)
+    return arrays
+
+
+class PriceSurface:
+    """Array-backed lookup table with linear interpolation along area."""
+
+    def __init__(self, arrays):
+        self.axes = {c: arrays[f'axis_{c}'] for c in SURFACE_AXES}
+        self._index = {c: {v: i for i, v in enumerate(values.tolist())} for c, values in self.axes.items()}
+        self.area = arrays['area']
+        self.log_price = arrays['log_price']
+
+    def _curve(self, **inputs):
+        position = []
+        for column in SURFACE_AXES:
+            value = INPUT_DTYPES[column](inputs[column])
+            if value not in self._index[column]:
+                return None
+            position.append(self._index[column][value])
+        return self.log_price[tuple(position)]
+
+    def price(self, built_up_area, **inputs):
+        """Approximate price in Cr, or None when the combination is off the grid."""
+        curve = self._curve(**inputs)
+        if curve is None:
+            return None
+        return float(np.expm1(np.interp(built_up_area, self.area, curve)))
+
+    @property
+    def nbytes(self):
+        return self.log_price.nbytes + self.area.nbytes
+
+
+def read_surface(file):
+    """``load_artifact`` loader: open .npz file -> PriceSurface."""
+    with np.load(file) as data:
+        return PriceSurface(dict(data))
+
+
+def load_surface(path=SURFACE_PATH):
+    """The shared PriceSurface, loaded once per process and reloaded when the file changes."""
+    return load_artifact(path, loader=read_surface).obj
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Precompute the what-if price surface')
+    parser.add_argument('--model', default=MODEL_PATH)
+    parser.add_argument('--data', default=DF_PATH, help='pickled training frame')
+    parser.add_argument('--output', default=SURFACE_PATH)
+    parser.add_argument('--area-points', type=int, default=AREA_POINTS)
+    args = parser.parse_args()
+
+    pipeline = load_artifact(args.model).obj
+    df = load_artifact(args.data).obj
+
+    start = time.perf_counter()
+    arrays = build_surface(pipeline, df, args.area_points)
+    np.savez(args.output, **arrays)
+
+    print(f'Grid: {" x ".join(str(n) for n in arrays["log_price"].shape)} '
+          f'= {arrays["log_price"].size:,} predictions in {time.perf_counter() - start:.1f}s')
+    print(f'Saved {arrays["log_price"].nbytes / 1e6:.1f} MB surface to {args.output}')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,437 @@
+"""
+Offline recommender artifacts
+The price and location similarity matrices are built once by a separate
+command and stored as float32 ``.npy`` files in a versioned directory, next
+to the property index and the location distance table. Facilities stay
+sparse end to end: their L2-normalized TF-IDF vectors are stored as CSR and
+scored per query through a term -> properties inverted index, so only
+properties sharing a facility with the selected one are touched. For large
+catalogues ``--mode graph`` stores only each property's top-k neighbours per
+component (CSR-style indices and scores), built blockwise in O(block x N)
+memory, plus the normalized features used to rescore the union of a
+property's neighbour lists exactly at query time; ``--mode ann`` stores an
+IVF index instead (see ``ann.py``). The Recommend page memory-maps them
+read-only, so every Streamlit worker shares the same physical pages and a
+cold start is an mmap instead of a recompute.
+
+Usage (from the project root):
+    python -m app.core.recommender
+    python -m app.core.recommender --mode graph --top-k 50
+    python -m app.core.recommender --mode ann --nprobe 8
+"""
+
+import argparse
+import functools
+import hashlib
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.preprocessing import StandardScaler, normalize
+
+from .ann import DEFAULT_DIM, DEFAULT_NPROBE, DEFAULT_RERANK, IVFIndex, combined_vectors, evaluate
+from .apartments import APARTMENTS_PATH, listings_frame, load_apartment_tables, location_frame, price_frame
+from .columnar import CURRENT_FILE, current_build, publish_build
+from .model_store import load_artifact
+
+RECOMMENDER_DIR = 'app/datasets/recommender'
+COMPONENTS = ['facilities', 'price', 'location']
+# Bump when the feature recipe changes so old artifacts are not reused
+BUILD_RECIPE = 'tfidf-1-2-csr/ohe-std/loc-std-54000'
+EXCLUDED_PROPERTIES = [22]
+MISSING_DISTANCE_M = 54000
+# Blend weights from the recommender notebook
+WEIGHTS = {'facilities': 30, 'price': 20, 'location': 8}
+# Kept as L2-normalized CSR vectors and scored per query, never as N x N
+SPARSE_COMPONENTS = ['facilities']
+GRAPH_PARTS = ['indptr', 'indices', 'scores']
+CSR_PARTS = ['data', 'indices', 'indptr']
+DEFAULT_TOP_K = 50
+DEFAULT_BLOCK = 1024
+
+
+def facility_features(df):
+    tfidf_vectorizer = TfidfVectorizer(stop_words='english', ngram_range=(1, 2))
+    return tfidf_vectorizer.fit_transform(df['TopFacilities'].apply(' '.join))
+
+
+def price_features(tables, df):
+    """Standardized one-hot price/area features, one row per property."""
+    price_df = price_frame(tables, df.index)
+    price_df['building type_Land'] = price_df['building type_Land'].replace({'': 'Land'})
+    categorical_columns = price_df.select_dtypes(include=['object']).columns.tolist()
+    ohe_df = pd.get_dummies(price_df, columns=categorical_columns, drop_first=True).fillna(0)
+    return StandardScaler().fit_transform(ohe_df)
+
+
+def location_distances(tables, df):
+    """Distance (m) from each property to each location advantage, missing filled with 54 km."""
+    return location_frame(tables, df.index).fillna(MISSING_DISTANCE_M)
+
+
+def build_features(tables):
+    """
+    Returns ``(properties, features, distances)``: CSV row ids of the
+    recommendable properties, {component: L2-normalized feature matrix} (so
+    cosine similarity is a dot product) and the distance frame.
+    """
+    df = listings_frame(tables).drop(EXCLUDED_PROPERTIES)
+    distances = location_distances(tables, df)
+    features = {
+        'facilities': facility_features(df),
+        'price': price_features(tables, df),
+        'location': StandardScaler().fit_transform(distances),
+    }
+    features = {name: normalize(matrix).astype(np.float32) for name, matrix in features.items()}
+    return df.index.to_numpy(np.int64), features, distances
+
+
+def build_similarities(features):
+    """{component: float32 N x N cosine matrix} for the dense (non-sparse) components."""
+    return {name: _dense(matrix @ matrix.T) for name, matrix in features.items()
+            if name not in SPARSE_COMPONENTS}
+
+
+def sparse_features(features):
+    return {name: features[name] for name in SPARSE_COMPONENTS}
+
+
+def _dense(block):
+    return np.asarray(block.toarray() if hasattr(block, 'toarray') else block, dtype=np.float32)
+
+
+def top_k_graph(matrix, k=DEFAULT_TOP_K, block=DEFAULT_BLOCK):
+    """
+    Top-k cosine neighbours of every row (self excluded) as CSR-style
+    ``(indptr, indices, scores)``, rows sorted by descending score. Rows are
+    processed ``block`` at a time, so peak memory is O(block x N).
+    """
+    n = matrix.shape[0]
+    k = min(k, n - 1)
+    indices = np.empty((n, k), dtype=np.int32)
+    scores = np.empty((n, k), dtype=np.float32)
+    for start in range(0, n, block):
+        stop = min(start + block, n)
+        sims = _dense(matrix[start:stop] @ matrix.T)
+        sims[np.arange(stop - start), np.arange(start, stop)] = -np.inf
+        top = np.argpartition(-sims, k - 1, axis=1)[:, :k]
+        top_scores = np.take_along_axis(sims, top, axis=1)
+        order = np.argsort(-top_scores, axis=1, kind='stable')
+        indices[start:stop] = np.take_along_axis(top, order, axis=1)
+        scores[start:stop] = np.take_along_axis(top_scores, order, axis=1)
+    indptr = np.arange(0, n * k + 1, k, dtype=np.int64)
+    return indptr, indices.ravel(), scores.ravel()
+
+
+def build_graph(features, k=DEFAULT_TOP_K, block=DEFAULT_BLOCK):
+    return {name: top_k_graph(matrix, k, block) for name, matrix in features.items()}
+
+
+@functools.lru_cache(maxsize=8)
+def _file_hash(path, mtime_ns, size):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()[:12]
+
+
+def source_hash(path=APARTMENTS_PATH):
+    """Content hash of the listings CSV, recomputed only when its size or mtime changes."""
+    stat = os.stat(path)
+    return _file_hash(os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+
+
+def source_version(*params, path=APARTMENTS_PATH):
+    """Build id: the recipe, the build parameters and the content of the CSV the features are read from."""
+    key = '/'.join([BUILD_RECIPE, *map(str, params), source_hash(path)])
+    return hashlib.sha256(key.encode()).hexdigest()[:12]
+
+
+def save_features(features, build_dir):
+    """Normalized feature matrices: dense as one .npy, sparse as CSR parts. Returns {name: layout}."""
+    layout = {}
+    for name, matrix in features.items():
+        if sparse.issparse(matrix):
+            matrix = sparse.csr_matrix(matrix)
+            for part in CSR_PARTS:
+                np.save(os.path.join(build_dir, f'{name}_features_{part}.npy'), getattr(matrix, part))
+            layout[name] = {'kind': 'sparse', 'shape': list(matrix.shape)}
+        else:
+            np.save(os.path.join(build_dir, f'{name}_features.npy'), np.ascontiguousarray(matrix))
+            layout[name] = {'kind': 'dense'}
+    return layout
+
+
+def load_features(layout, build_dir):
+    def array(name):
+        return np.load(os.path.join(build_dir, f'{name}.npy'), mmap_mode='r')
+
+    features = {}
+    for name, entry in layout.items():
+        if entry['kind'] == 'sparse':
+            parts = [array(f'{name}_features_{part}') for part in CSR_PARTS]
+            features[name] = sparse.csr_matrix(tuple(parts), shape=tuple(entry['shape']), copy=False)
+        else:
+            features[name] = array(f'{name}_features')
+    return features
+
+
+def write_artifacts(properties, distances, version, similarities=None, graph=None, features=None,
+                    ann=None, ann_params=None, directory=RECOMMENDER_DIR):
+    """
+    Write one versioned build (dense similarity matrices, or a top-k graph /
+    ANN index plus the features used to rescore candidates) and point
+    ``CURRENT`` at it. The build is written to a scratch directory and
+    renamed into place, so a live build is never written under; a build that
+    already exists for ``version`` has identical inputs and is reused as is.
+    """
+    build_dir = os.path.join(directory, version)
+    if not os.path.exists(os.path.join(build_dir, 'manifest.json')):
+        scratch = os.path.join(directory, f'{version}.{os.getpid()}.tmp')
+        shutil.rmtree(scratch, ignore_errors=True)
+        os.makedirs(scratch)
+        _write_build(scratch, properties, distances, version, similarities, graph, features, ann, ann_params)
+        # Without a manifest the directory was never published: a crashed write
+        shutil.rmtree(build_dir, ignore_errors=True)
+        os.rename(scratch, build_dir)
+    publish_build(directory, version)
+    return build_dir
+
+
+def _write_build(build_dir, properties, distances, version, similarities, graph, features, ann, ann_params):
+    similarities, graph, features = similarities or {}, graph or {}, features or {}
+    np.save(os.path.join(build_dir, 'properties.npy'), properties)
+    for name, matrix in similarities.items():
+        np.save(os.path.join(build_dir, f'{name}.npy'), np.ascontiguousarray(matrix, dtype=np.float32))
+    for name, arrays in graph.items():
+        for part, array in zip(GRAPH_PARTS, arrays):
+            np.save(os.path.join(build_dir, f'{name}_{part}.npy'), array)
+    feature_layout = save_features(features, build_dir)
+    if ann is not None:
+        ann.save(build_dir)
+    np.save(os.path.join(build_dir, 'distances.npy'), distances.to_numpy(np.float32))
+    with open(os.path.join(build_dir, 'manifest.json'), 'w') as f:
+        json.dump({'version': version, 'recipe': BUILD_RECIPE, 'properties': int(len(properties)),
+                   'components': list(similarities), 'graph_components': list(graph),
+                   'features': feature_layout, 'ann': ann_params if ann is not None else None,
+                   'source': source_hash(), 'locations': distances.columns.tolist()}, f, indent=1)
+
+
+class Recommender:
+    """
+    Similarities over properties identified by CSV row id: dense N x N
+    float32 matrices, a sparse top-k neighbour graph per component, or an
+    IVF index over the blended feature vectors.
+    """
+
+    def __init__(self, properties, distances, version, similarities=None, graph=None, features=None,
+                 ann=None, ann_params=None, source=None):
+        self.properties = properties
+        self.distances = distances
+        self.version = version
+        self.source = source
+        self.similarities = similarities or {}
+        self.graph = graph or {}
+        self.features = features or {}
+        self.ann = ann
+        self.ann_params = ann_params or {}
+        self._postings = {}
+
+    @classmethod
+    def from_tables(cls, tables):
+        properties, features, distances = build_features(tables)
+        return cls(properties, distances, 'in-memory', similarities=build_similarities(features),
+                   features=sparse_features(features), source=source_hash())
+
+    @classmethod
+    def load(cls, build_dir):
+        """Memory-map a build directory read-only."""
+        with open(os.path.join(build_dir, 'manifest.json')) as f:
+            manifest = json.load(f)
+
+        def array(name):
+            return np.load(os.path.join(build_dir, f'{name}.npy'), mmap_mode='r')
+
+        properties = np.load(os.path.join(build_dir, 'properties.npy'))
+        similarities = {name: array(name) for name in manifest['components']}
+        graph = {name: tuple(array(f'{name}_{part}') for part in GRAPH_PARTS)
+                 for name in manifest.get('graph_components', [])}
+        features = load_features(manifest.get('features', {}), build_dir)
+        ann_params = manifest.get('ann')
+        ann = IVFIndex.load(build_dir) if ann_params else None
+        distances = pd.DataFrame(array('distances'), index=properties, columns=manifest['locations'], copy=False)
+        return cls(properties, distances, manifest['version'], similarities=similarities, graph=graph,
+                   features=features, ann=ann, ann_params=ann_params, source=manifest.get('source'))
+
+    @property
+    def mode(self):
+        if self.similarities:
+            return 'dense'
+        return 'ann' if self.ann is not None else 'graph'
+
+    @property
+    def nbytes(self):
+        arrays = list(self.similarities.values()) + [a for parts in self.graph.values() for a in parts]
+        for matrix in self.features.values():
+            arrays += [getattr(matrix, part) for part in CSR_PARTS] if sparse.issparse(matrix) else [matrix]
+        return sum(a.nbytes for a in arrays) + (self.ann.nbytes if self.ann is not None else 0)
+
+    def similar(self, row, k=5, weights=WEIGHTS):
+        """
+        Top-k (positions, blended scores) of the property at position ``row``,
+        best first. ANN builds have their blend weights baked into the index
+        and raise ValueError for any other ``weights``.
+        """
+        if self.mode == 'dense':
+            return self.dense_neighbors(row, k, weights)
+        if self.mode == 'ann':
+            built_with = self.ann_params.get('weights', WEIGHTS)
+            if dict(weights) != built_with:
+                raise ValueError(f'This ANN build blends with weights {built_with}; rebuild it '
+                                 f'(python -m app.core.recommender --mode ann) to use {dict(weights)}')
+            return self.ann.search(row, k, self.ann_params['nprobe'], self.ann_params['rerank'])
+        return self.graph_neighbors(row, k, weights)
+
+    def postings(self, name):
+        """Inverted index (terms x properties CSR) of a sparse component, built on first use."""
+        if name not in self._postings:
+            self._postings[name] = sparse.csr_matrix(self.features[name].T)
+        return self._postings[name]
+
+    def sparse_scores(self, name, row, inverted=True):
+        """
+        Cosine of property ``row`` against every property for a sparse
+        component, as a dense length-N vector. With ``inverted`` only the
+        properties sharing at least one term with it are touched.
+        """
+        matrix = self.features[name]
+        if not inverted:
+            return _dense(matrix @ matrix[row].T).ravel()
+        start, stop = matrix.indptr[row], matrix.indptr[row + 1]
+        terms, values = matrix.indices[start:stop], matrix.data[start:stop]
+        postings = self.postings(name)
+        lengths = postings.indptr[terms + 1] - postings.indptr[terms]
+        spans = [np.arange(postings.indptr[t], postings.indptr[t + 1]) for t in terms]
+        positions = np.concatenate(spans) if spans else np.zeros(0, dtype=np.int64)
+        return np.bincount(postings.indices[positions], weights=postings.data[positions] * np.repeat(values, lengths),
+                           minlength=matrix.shape[0])
+
+    def dense_neighbors(self, row, k=5, weights=WEIGHTS):
+        """
+        Blend only the selected row of each matrix (O(N)), scoring sparse
+        components through their inverted index, and partially sort it.
+        """
+        blended = np.zeros(len(self.properties), dtype=np.float64)
+        for name, weight in weights.items():
+            if name in self.similarities:
+                blended += weight * self.similarities[name][row]
+            else:
+                blended += weight * self.sparse_scores(name, row)
+        blended[row] = -np.inf
+        k = min(k, len(blended) - 1)
+        top = np.argpartition(-blended, k - 1)[:k]
+        top = top[np.argsort(-blended[top], kind='stable')]
+        return top, blended[top]
+
+    def graph_neighbors(self, row, k=5, weights=WEIGHTS):
+        """
+        Top-k (positions, blended scores) for the property at position
+        ``row``. Candidates are the union of its per-component neighbour
+        lists; each candidate is rescored exactly from the stored features.
+        """
+        candidates = np.unique(np.concatenate([
+            self.graph[name][1][self.graph[name][0][row]:self.graph[name][0][row + 1]] for name in weights]))
+        blended = np.zeros(len(candidates), dtype=np.float64)
+        for name, weight in weights.items():
+            matrix = self.features[name]
+            blended += weight * _dense(matrix[candidates] @ matrix[row].T).ravel()
+        top = np.argsort(-blended, kind='stable')[:k]
+        return candidates[top], blended[top]
+
+
+def _load_current(pointer_file):
+    return Recommender.load(current_build(os.path.dirname(pointer_file.name)))
+
+
+def _build_in_memory(source_file):
+    return Recommender.from_tables(load_apartment_tables())
+
+
+def load_recommender(directory=RECOMMENDER_DIR):
+    """
+    Shared Artifact holding the Recommender: the current memory-mapped build
+    (reloaded when the pointer changes) while it was built from the CSV as it
+    is now, otherwise built in memory once per source file version.
+    """
+    pointer = os.path.join(directory, CURRENT_FILE)
+    if os.path.exists(pointer):
+        artifact = load_artifact(pointer, loader=_load_current)
+        if artifact.obj.source == source_hash():
+            return artifact
+    return load_artifact(APARTMENTS_PATH, loader=_build_in_memory)
+
+
+def is_current(directory=RECOMMENDER_DIR):
+    """True when the live build was made from the current listings CSV."""
+    try:
+        with open(os.path.join(current_build(directory), 'manifest.json')) as f:
+            return json.load(f).get('source') == source_hash()
+    except (OSError, ValueError):
+        return False
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the Recommend page similarity artifacts")
+    parser.add_argument('--mode', choices=['dense', 'graph', 'ann'], default='dense',
+                        help="dense: N x N matrices; graph: top-k neighbours per property; "
+                             "ann: IVF index over blended vectors (for large N)")
+    parser.add_argument('--top-k', type=int, default=DEFAULT_TOP_K, help="Neighbours kept per property in graph mode")
+    parser.add_argument('--block', type=int, default=DEFAULT_BLOCK, help="Rows scored per block in graph mode")
+    parser.add_argument('--nlist', type=int, default=None, help="ANN clusters (default sqrt(N))")
+    parser.add_argument('--dim', type=int, default=DEFAULT_DIM, help="ANN random projection dimensions")
+    parser.add_argument('--nprobe', type=int, default=DEFAULT_NPROBE, help="ANN lists scanned per query")
+    parser.add_argument('--rerank', type=int, default=DEFAULT_RERANK, help="ANN candidates rescored exactly")
+    parser.add_argument('--if-stale', action='store_true',
+                        help="Only build when there is no build from the current listings CSV (any mode)")
+    args = parser.parse_args()
+
+    if args.if_stale and is_current():
+        print('Recommender artifacts are up to date')
+        return
+
+    start = time.perf_counter()
+    properties, features, distances = build_features(load_apartment_tables())
+    if args.mode == 'ann':
+        index = IVFIndex.build(combined_vectors(features, WEIGHTS), args.nlist, args.dim)
+        params = {'nlist': index.nlist, 'dim': int(index.projected.shape[1]),
+                  'nprobe': args.nprobe, 'rerank': args.rerank, 'weights': WEIGHTS}
+        version = source_version('ann', *params.values())
+        # The index stores the combined vectors itself; the features are not needed again
+        build_dir = write_artifacts(properties, distances, version, ann=index, ann_params=params)
+        recall = evaluate(index, nprobes=[args.nprobe], rerank=args.rerank)[0]
+        summary = (f"IVF index with {index.nlist} lists (recall@5 {recall['recall@5']:.3f} at "
+                   f"nprobe={args.nprobe}, {recall['query_ms']:.2f} ms/query)")
+    elif args.mode == 'graph':
+        version = source_version('graph', args.top_k)
+        graph = build_graph(features, args.top_k, args.block)
+        build_dir = write_artifacts(properties, distances, version, graph=graph, features=features)
+        summary = f'top-{args.top_k} graph for {len(graph)} components'
+    else:
+        version = source_version('dense')
+        similarities = build_similarities(features)
+        build_dir = write_artifacts(properties, distances, version, similarities=similarities,
+                                    features=sparse_features(features))
+        summary = f"{len(similarities)} similarity matrices + sparse {', '.join(SPARSE_COMPONENTS)}"
+    size_mb = sum(entry.stat().st_size for entry in os.scandir(build_dir)) / 1e6
+    print(f'Recommender {version}: {len(properties):,} properties, {summary} '
+          f'({size_mb:.1f} MB) -> {build_dir} in {time.perf_counter() - start:.2f}s')
+
+
+if __name__ == "__main__":
+    main()
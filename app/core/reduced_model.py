@@ -0,0 +1,86 @@
+"""
+Reduced (kernel-approximated) price model
+Replaces the exact RBF SVR, whose scoring cost grows with the number of
+support vectors, by a Nystroem feature map of fixed size followed by a
+linear Ridge regressor. Prediction cost is then O(n_components) per row no
+matter how many listings the model was trained on.
+"""
+
+import json
+import pickle
+import time
+
+import numpy as np
+from sklearn.base import clone
+from sklearn.kernel_approximation import Nystroem
+from sklearn.linear_model import Ridge
+from sklearn.metrics import mean_absolute_error, r2_score
+from sklearn.pipeline import Pipeline
+
+REDUCED_MODEL_PATH = 'app/models/pipeline_reduced.pkl'
+REDUCED_REPORT_PATH = 'app/models/reduced_model_report.json'
+DEFAULT_COMPONENTS = 300
+
+
+def build_reduced_pipeline(full_pipeline, n_components=DEFAULT_COMPONENTS, alpha=1e-2, random_state=42):
+    """
+    Unfitted approximation of ``full_pipeline``: same preprocessing, the SVR's
+    fitted gamma for the Nystroem map, and a Ridge on top.
+    """
+    svr = full_pipeline[-1]
+    return Pipeline([
+        ('preprocessor', clone(full_pipeline[0])),
+        ('features', Nystroem(kernel='rbf', gamma=svr._gamma, n_components=n_components,
+                              random_state=random_state)),
+        ('regressor', Ridge(alpha=alpha)),
+    ])
+
+
+def _latency(pipeline, X, single_rows=100):
+    start = time.perf_counter()
+    pipeline.predict(X)
+    batch = time.perf_counter() - start
+
+    rows = [X.iloc[[i]] for i in range(min(single_rows, len(X)))]
+    start = time.perf_counter()
+    for row in rows:
+        pipeline.predict(row)
+    single = (time.perf_counter() - start) / len(rows)
+    return single * 1000, batch * 1000
+
+
+def compare_models(full_pipeline, reduced_pipeline, X_test, y_test):
+    """
+    Accuracy (on the original price scale), latency and size of both models.
+    ``y_test`` is the log1p target the pipelines were trained on.
+    """
+    y_true = np.expm1(y_test)
+    report = {'test_rows': len(X_test)}
+    for name, pipeline in [('full', full_pipeline), ('reduced', reduced_pipeline)]:
+        y_pred = np.expm1(pipeline.predict(X_test))
+        row_ms, batch_ms = _latency(pipeline, X_test)
+        report[name] = {
+            'r2': float(r2_score(y_true, y_pred)),
+            'mae_cr': float(mean_absolute_error(y_true, y_pred)),
+            'row_ms': row_ms,
+            'batch_ms': batch_ms,
+            'size_mb': len(pickle.dumps(pipeline)) / 1e6,
+        }
+    report['full']['n_basis'] = int(len(full_pipeline[-1].support_))
+    report['reduced']['n_basis'] = int(reduced_pipeline.named_steps['features'].n_components)
+    report['r2_loss'] = report['full']['r2'] - report['reduced']['r2']
+    report['batch_speedup'] = report['full']['batch_ms'] / max(report['reduced']['batch_ms'], 1e-9)
+    return report
+
+
+def save_report(report, path=REDUCED_REPORT_PATH):
+    with open(path, 'w') as f:
+        json.dump(report, f, indent=2)
+
+
+def load_report(path=REDUCED_REPORT_PATH):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
@@ -0,0 +1,79 @@
+"""
+Server-side reduction for large scatter plots
+Above ``MAX_POINTS`` rows a scatter is sent to the browser either as a
+grid-stratified point sample (at most k points per x/y cell, so sparse
+regions and outliers survive while dense clusters are thinned) or as a 2-D
+binned density. Both are computed in NumPy and memoized per data version
+and property type.
+"""
+
+import numpy as np
+
+from .viz_data import memoize_on_version
+
+MAX_POINTS = 5000
+SAMPLE_GRID = 64
+DENSITY_BINS = 120
+SCATTER_MODES = ['Auto', 'Exact', 'Sampled', 'Density']
+
+
+def grid_cells(x, y, bins):
+    """Flat cell index of each point on a ``bins`` x ``bins`` grid over the data range."""
+    def bin_index(values):
+        low, high = np.nanmin(values), np.nanmax(values)
+        scaled = (values - low) / ((high - low) or 1.0)
+        return np.clip((scaled * bins).astype(np.int64), 0, bins - 1)
+    return bin_index(x) * bins + bin_index(y)
+
+
+def stratified_sample(x, y, max_points=MAX_POINTS, bins=SAMPLE_GRID, seed=0):
+    """
+    Row positions of at most ``max_points`` points, keeping up to k random
+    points per grid cell with k the largest cap that fits the budget.
+    """
+    n = len(x)
+    if n <= max_points:
+        return np.arange(n)
+    cells = grid_cells(x, y, bins)
+    order = np.random.default_rng(seed).permutation(n)
+    order = order[np.argsort(cells[order], kind='stable')]
+    sorted_cells = cells[order]
+    starts = np.flatnonzero(np.r_[True, sorted_cells[1:] != sorted_cells[:-1]])
+    counts = np.diff(np.r_[starts, n])
+    rank = np.arange(n) - np.repeat(starts, counts)
+
+    # Largest per-cell cap k with sum(min(count, k)) <= max_points
+    low, high = 1, int(counts.max())
+    while low < high:
+        mid = (low + high + 1) // 2
+        if np.minimum(counts, mid).sum() <= max_points:
+            low = mid
+        else:
+            high = mid - 1
+    return np.sort(order[rank < low])
+
+
+def density_grid(x, y, bins=DENSITY_BINS):
+    """``(counts, x_centers, y_centers)``; counts are indexed [y, x] for heatmaps."""
+    counts, x_edges, y_edges = np.histogram2d(x, y, bins=bins)
+    return counts.T, (x_edges[:-1] + x_edges[1:]) / 2, (y_edges[:-1] + y_edges[1:]) / 2
+
+
+def resolve_mode(mode, rows, max_points=MAX_POINTS):
+    if mode != 'Auto':
+        return mode
+    return 'Exact' if rows <= max_points else 'Sampled'
+
+
+@memoize_on_version
+def scatter_points(df, property_type, x, y, max_points=MAX_POINTS):
+    """Rows of one property type reduced to at most ``max_points`` scatter points."""
+    rows = df[df['property_type'] == property_type]
+    keep = stratified_sample(rows[x].to_numpy(np.float64), rows[y].to_numpy(np.float64), max_points)
+    return rows.iloc[keep]
+
+
+@memoize_on_version
+def scatter_density(df, property_type, x, y, bins=DENSITY_BINS):
+    rows = df[df['property_type'] == property_type]
+    return density_grid(rows[x].to_numpy(np.float64), rows[y].to_numpy(np.float64), bins)
@@ -0,0 +1,38 @@
+"""
+Price sensitivity curves for a single listing
+All curve points (a built-up area sweep and a bedroom sweep) are stacked into
+one DataFrame and scored with a single predict call.
+"""
+
+import numpy as np
+import pandas as pd
+
+from .batch_predict import FEATURE_COLUMNS, INPUT_DTYPES, predict_frame
+
+AREA_POINTS = 40
+
+
+def area_range(built_up_area, points=AREA_POINTS, low=100.0, high=10000.0):
+    """Areas from half to twice the listing's area, clipped to the form limits."""
+    return np.linspace(max(built_up_area * 0.5, low), min(built_up_area * 2.0, high), points)
+
+
+def sensitivity_frame(row, areas, bedrooms):
+    base = pd.DataFrame([row] * (len(areas) + len(bedrooms)), columns=FEATURE_COLUMNS)
+    base.loc[:len(areas) - 1, 'built_up_area'] = areas
+    base.loc[len(areas):, 'bedRoom'] = bedrooms
+    return base.astype(INPUT_DTYPES)
+
+
+def price_curves(pipeline, row, bedrooms, points=AREA_POINTS):
+    """
+    Return ``(area_curve, bedroom_curve)`` DataFrames for ``row`` (a dict of the
+    12 inputs), priced in Cr, from one batched prediction.
+    """
+    areas = area_range(float(row['built_up_area']), points)
+    bedrooms = np.asarray(bedrooms, dtype=float)
+    prices = predict_frame(pipeline, sensitivity_frame(row, areas, bedrooms))
+
+    area_curve = pd.DataFrame({'built_up_area': areas, 'price': prices[:len(areas)]})
+    bedroom_curve = pd.DataFrame({'bedRoom': bedrooms, 'price': prices[len(areas):]})
+    return area_curve, bedroom_curve
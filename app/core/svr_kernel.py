@@ -0,0 +1,271 @@
+"""
+Compiled NumPy inference for the RBF SVR price pipeline
+``export`` flattens the fitted sklearn Pipeline (StandardScaler + OneHotEncoder
+ColumnTransformer, then SVR) into plain arrays; ``CompiledSVR`` scores a whole
+batch with one matrix-kernel evaluation, optionally in float32. The export
+records the hash of the pickle it came from, and ``load_model`` only serves
+the compiled engine while that pickle is unchanged.
+
+Usage (from the project root):
+    python -m app.core.svr_kernel export           # writes app/models/svr_kernel.npz
+    python -m app.core.svr_kernel bench --rows 2000
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from .model_store import DF_PATH, MODEL_PATH, load_artifact
+
+KERNEL_PATH = 'app/models/svr_kernel.npz'
+ENGINES = ['sklearn', 'compiled']
+
+
+def _dense(matrix):
+    return matrix.toarray() if hasattr(matrix, 'toarray') else np.asarray(matrix)
+
+
+def export_pipeline(pipeline, model_sha256=None):
+    """
+    Flatten a fitted pipeline into a dict of arrays (the .npz layout).
+    ``model_sha256`` is the hash of the pickle the pipeline is saved as.
+    """
+    from sklearn.preprocessing import OneHotEncoder, StandardScaler
+
+    preprocessor = pipeline[:-1][-1] if len(pipeline) > 1 else None
+    svr = pipeline[-1]
+    if getattr(svr, 'kernel', None) != 'rbf':
+        raise ValueError('Only RBF-kernel SVR pipelines can be compiled')
+
+    arrays = {}
+    num_columns, cat_columns = [], []
+    for name, transformer, columns in preprocessor.transformers_:
+        if transformer == 'drop' or len(columns) == 0:
+            continue
+        if isinstance(transformer, StandardScaler):
+            if num_columns or cat_columns:
+                raise ValueError('Expected a single scaled numeric block before the one-hot block')
+            num_columns += list(columns)
+            arrays['num_mean'] = transformer.mean_
+            arrays['num_scale'] = transformer.scale_
+        elif isinstance(transformer, OneHotEncoder):
+            drop_idx = transformer.drop_idx_
+            for i, (column, categories) in enumerate(zip(columns, transformer.categories_)):
+                cat_columns.append(column)
+                numeric = categories.dtype.kind in 'fiu'
+                arrays[f'cat_values_{i}'] = categories.astype(float if numeric else str)
+                arrays[f'cat_drop_{i}'] = np.array(-1 if drop_idx is None or drop_idx[i] is None else drop_idx[i])
+        else:
+            raise ValueError(f'Cannot compile transformer {name!r} ({type(transformer).__name__})')
+
+    arrays['num_columns'] = np.array(num_columns, dtype=str)
+    arrays['cat_columns'] = np.array(cat_columns, dtype=str)
+    arrays['support_vectors'] = _dense(svr.support_vectors_)
+    arrays['dual_coef'] = _dense(svr.dual_coef_).ravel()
+    arrays['gamma'] = np.array(svr._gamma)
+    arrays['intercept'] = np.array(svr.intercept_[0])
+    if model_sha256 is not None:
+        arrays['model_sha256'] = np.array(model_sha256)
+    return arrays
+
+
+class CompiledSVR:
+    """Drop-in replacement for ``pipeline.predict`` (returns log1p price)."""
+
+    def __init__(self, arrays, dtype=np.float64):
+        self.dtype = np.dtype(dtype)
+        self.num_columns = arrays['num_columns'].tolist()
+        self.cat_columns = arrays['cat_columns'].tolist()
+        self.num_mean = arrays['num_mean'].astype(self.dtype)
+        self.num_scale = arrays['num_scale'].astype(self.dtype)
+
+        # Per categorical column: sorted vocabulary, dropped slot and output offset
+        self.cat_values, self.cat_drop, self.cat_offset = [], [], []
+        offset = len(self.num_columns)
+        for i in range(len(self.cat_columns)):
+            values = arrays[f'cat_values_{i}']
+            drop = int(arrays[f'cat_drop_{i}'])
+            self.cat_values.append(values)
+            self.cat_drop.append(drop)
+            self.cat_offset.append(offset)
+            offset += len(values) - (drop >= 0)
+        self.n_features = offset
+
+        self.support_vectors = np.ascontiguousarray(arrays['support_vectors'], dtype=self.dtype)
+        self.sv_sq_norms = np.einsum('ij,ij->i', self.support_vectors, self.support_vectors)
+        self.dual_coef = arrays['dual_coef'].astype(self.dtype)
+        self.gamma = self.dtype.type(arrays['gamma'])
+        self.intercept = float(arrays['intercept'])
+        self.model_sha256 = str(arrays['model_sha256']) if 'model_sha256' in arrays else None
+
+    @classmethod
+    def from_pipeline(cls, pipeline, dtype=np.float64):
+        return cls(export_pipeline(pipeline), dtype)
+
+    @classmethod
+    def load(cls, path=KERNEL_PATH, dtype=np.float64):
+        with np.load(path) as data:
+            return cls(dict(data), dtype)
+
+    @property
+    def n_support(self):
+        return len(self.support_vectors)
+
+    def _positions(self, i, column):
+        vocabulary = self.cat_values[i]
+        # Plain str (not the vocabulary's fixed width) so long inputs are not truncated
+        values = np.asarray(column, dtype=float if vocabulary.dtype.kind == 'f' else str)
+        positions = np.searchsorted(vocabulary, values)
+        positions = np.minimum(positions, len(vocabulary) - 1)
+        unknown = vocabulary[positions] != values
+        if unknown.any():
+            raise ValueError(f'Found unknown categories {sorted(set(values[unknown].tolist()))} '
+                             f'in column {self.cat_columns[i]!r}')
+        return positions
+
+    def transform(self, frame):
+        """Scaled numeric + one-hot design matrix for a DataFrame or dict of columns."""
+        n = len(frame[self.num_columns[0]])
+        X = np.zeros((n, self.n_features), dtype=self.dtype)
+
+        numeric = np.column_stack([np.asarray(frame[c], dtype=self.dtype) for c in self.num_columns])
+        if np.isnan(numeric).any():
+            # As sklearn would, rather than returning NaN prices
+            raise ValueError('Input contains NaN')
+        X[:, :len(self.num_columns)] = (numeric - self.num_mean) / self.num_scale
+
+        rows = np.arange(n)
+        for i, column in enumerate(self.cat_columns):
+            positions = self._positions(i, frame[column])
+            drop = self.cat_drop[i]
+            keep = positions != drop
+            slots = positions - ((drop >= 0) & (positions > drop))
+            X[rows[keep], self.cat_offset[i] + slots[keep]] = 1
+        return X
+
+    def decision(self, X):
+        # ||x - sv||^2 expanded so the heavy part is a single GEMM
+        sq_dist = np.einsum('ij,ij->i', X, X)[:, None] + self.sv_sq_norms[None, :] \
+            - 2 * (X @ self.support_vectors.T)
+        np.maximum(sq_dist, 0, out=sq_dist)
+        kernel = np.exp(-self.gamma * sq_dist, out=sq_dist)
+        return kernel @ self.dual_coef + self.intercept
+
+    def predict(self, frame):
+        return self.decision(self.transform(frame)).astype(np.float64)
+
+    @property
+    def nbytes(self):
+        return self.support_vectors.nbytes + self.dual_coef.nbytes + self.sv_sq_norms.nbytes
+
+
+def export(model_path=MODEL_PATH, output_path=KERNEL_PATH):
+    from .manifest import file_sha256
+
+    pipeline = load_artifact(model_path).obj
+    arrays = export_pipeline(pipeline, file_sha256(model_path))
+    np.savez(output_path, **arrays)
+    return arrays
+
+
+def load_compiled(file):
+    """``load_artifact`` loader for an exported kernel (.npz)."""
+    with np.load(file) as data:
+        return CompiledSVR(dict(data))
+
+
+def kernel_matches(model_path=MODEL_PATH, kernel_path=KERNEL_PATH):
+    """True when ``kernel_path`` was exported from ``model_path`` as it is now."""
+    from .manifest import file_sha256
+
+    try:
+        with np.load(kernel_path) as data:
+            exported = str(data['model_sha256']) if 'model_sha256' in data else None
+        return exported == file_sha256(model_path)
+    except OSError:
+        return False
+
+
+def load_model(model_path=MODEL_PATH, engine='sklearn', kernel_path=KERNEL_PATH):
+    """
+    ``(artifact, engine used)``: the shared Artifact whose ``obj.predict``
+    returns log1p price. ``engine='compiled'`` serves the exported kernel
+    when it matches ``model_path`` and falls back to the sklearn pipeline
+    otherwise.
+    """
+    if engine == 'compiled' and kernel_matches(model_path, kernel_path):
+        return load_artifact(kernel_path, loader=load_compiled), 'compiled'
+    return load_artifact(model_path), 'sklearn'
+
+
+def _time(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat
+
+
+def benchmark(pipeline, frame, single_rows=200, dtype=np.float64):
+    """Compare the compiled engine with sklearn on ``frame``; returns a summary dict."""
+    engine = CompiledSVR.from_pipeline(pipeline, dtype)
+
+    reference = pipeline.predict(frame)
+    compiled = engine.predict(frame)
+
+    singles = [frame.iloc[[i]] for i in range(min(single_rows, len(frame)))]
+    sk_single = _time(lambda: [pipeline.predict(row) for row in singles], 1) / len(singles)
+    np_single = _time(lambda: [engine.predict(row) for row in singles], 1) / len(singles)
+    sk_batch = _time(lambda: pipeline.predict(frame), 3)
+    np_batch = _time(lambda: engine.predict(frame), 3)
+
+    return {
+        'rows': len(frame),
+        'support_vectors': engine.n_support,
+        'dtype': engine.dtype.name,
+        'max_abs_error': float(np.max(np.abs(reference - compiled))),
+        'sklearn_row_ms': sk_single * 1000,
+        'compiled_row_ms': np_single * 1000,
+        'row_speedup': sk_single / np_single,
+        'sklearn_batch_ms': sk_batch * 1000,
+        'compiled_batch_ms': np_batch * 1000,
+        'batch_speedup': sk_batch / np_batch,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compile the SVR pipeline to NumPy arrays')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    export_cmd = sub.add_parser('export', help='write the flattened model to .npz')
+    export_cmd.add_argument('--model', default=MODEL_PATH)
+    export_cmd.add_argument('--output', default=KERNEL_PATH)
+
+    bench_cmd = sub.add_parser('bench', help='check accuracy and speed against sklearn')
+    bench_cmd.add_argument('--model', default=MODEL_PATH)
+    bench_cmd.add_argument('--data', default=DF_PATH, help='pickled training frame')
+    bench_cmd.add_argument('--rows', type=int, default=2000)
+    bench_cmd.add_argument('--float32', action='store_true')
+    args = parser.parse_args()
+
+    if args.command == 'export':
+        arrays = export(args.model, args.output)
+        print(f'Exported {len(arrays["support_vectors"])} support vectors '
+              f'x {arrays["support_vectors"].shape[1]} features to {args.output}')
+        return
+
+    from .batch_predict import FEATURE_COLUMNS
+    pipeline = load_artifact(args.model).obj
+    frame = load_artifact(args.data).obj[FEATURE_COLUMNS].head(args.rows)
+    result = benchmark(pipeline, frame, dtype=np.float32 if args.float32 else np.float64)
+
+    print(f'Rows: {result["rows"]:,} | Support vectors: {result["support_vectors"]:,} | dtype: {result["dtype"]}')
+    print(f'Max |sklearn - compiled| (log price): {result["max_abs_error"]:.2e}')
+    print(f'Single row: sklearn {result["sklearn_row_ms"]:.3f} ms, compiled {result["compiled_row_ms"]:.3f} ms '
+          f'({result["row_speedup"]:.1f}x)')
+    print(f'Batch:      sklearn {result["sklearn_batch_ms"]:.1f} ms, compiled {result["compiled_batch_ms"]:.1f} ms '
+          f'({result["batch_speedup"]:.1f}x)')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Typed, cached data layer for the Analytics Dashboard
+The listing data is parsed once per process with explicit dtypes (categorical
+text columns, float32 numbers) and shared read-only by every session.
+Derived aggregates are memoized per data version, so widget changes never
+re-read the CSV or regroup the frame.
+"""
+
+import functools
+import pickle
+import threading
+
+import numpy as np
+import pandas as pd
+
+from .columnar import current_path, is_fresh, load_table_file, table_dir
+from .model_store import load_artifact
+
+VIZ_DATA_PATH = 'app/datasets/data_viz1.csv'
+FEATURE_TEXT_PATH = 'app/datasets/feature_text.pkl'
+
+CATEGORY_COLUMNS = ['property_type', 'society', 'sector', 'balcony', 'agePossession']
+FLOAT_COLUMNS = ['price', 'price_per_sqft', 'bedRoom', 'bathroom', 'floorNum', 'built_up_area',
+                 'study room', 'servant room', 'store room', 'pooja room', 'others',
+                 'furnishing_type', 'luxury_score', 'latitude', 'longitude']
+VIZ_DTYPES = {**{c: 'category' for c in CATEGORY_COLUMNS}, **{c: np.float32 for c in FLOAT_COLUMNS}}
+
+
+def split_coordinates(coordinates):
+    """'28.4160° N, 76.9914° E' strings -> (latitude, longitude) float arrays."""
+    parts = coordinates.str.extract(r'([\d.]+)°\s*([NS]),\s*([\d.]+)°\s*([EW])')
+    latitude = parts[0].astype(np.float32) * np.where(parts[1] == 'S', -1, 1)
+    longitude = parts[2].astype(np.float32) * np.where(parts[3] == 'W', -1, 1)
+    return latitude.to_numpy(np.float32), longitude.to_numpy(np.float32)
+
+
+def read_viz_csv(source):
+    header = pd.read_csv(source, nrows=0).columns
+    if hasattr(source, 'seek'):
+        source.seek(0)
+    # Only the text 'coordinates' column is dropped; lat/long arrive pre-split
+    usecols = [c for c in header if c != 'coordinates' or 'latitude' not in header]
+    df = pd.read_csv(source, usecols=usecols,
+                     dtype={c: t for c, t in VIZ_DTYPES.items() if c in usecols})
+    if 'latitude' not in df:
+        df['latitude'], df['longitude'] = split_coordinates(df.pop('coordinates'))
+    return df
+
+
+def load_viz_data(path=VIZ_DATA_PATH):
+    """
+    The shared Artifact holding the typed listings frame: memory-mapped from
+    the columnar build when it matches the CSV, otherwise parsed from the CSV.
+    """
+    if is_fresh(table_dir('data_viz1'), path):
+        return load_artifact(current_path('data_viz1'), loader=load_table_file)
+    return load_artifact(path, loader=read_viz_csv)
+
+
+def load_feature_text(path=FEATURE_TEXT_PATH):
+    return load_artifact(path, loader=pickle.load)
+
+
+_memo_lock = threading.Lock()
+_memo = {}
+
+
+def memoize_on_version(fn):
+    """
+    Cache ``fn(frame, *args, **kwargs)`` per (data version, arguments).
+    Called with the Artifact; entries for superseded versions are dropped.
+    """
+    @functools.wraps(fn)
+    def wrapper(artifact, *args, **kwargs):
+        key = (fn.__name__, artifact.path, args, tuple(sorted(kwargs.items())))
+        with _memo_lock:
+            cached = _memo.get(key)
+            if cached is not None and cached[0] == artifact.version:
+                return cached[1]
+        value = fn(artifact.obj, *args, **kwargs)
+        with _memo_lock:
+            _memo[key] = (artifact.version, value)
+        return value
+    return wrapper
+
+
+@memoize_on_version
+def rows_for(df, column, value):
+    return df[df[column] == value]
+
+
+@memoize_on_version
+def sectors(df):
+    """Sectors with at least one listing row, sorted."""
+    return sorted(df['sector'].dropna().unique().tolist())
+
+
+@memoize_on_version
+def memory_footprint(df):
+    """Deep in-memory size of the frame, in bytes."""
+    return int(df.memory_usage(deep=True).sum())
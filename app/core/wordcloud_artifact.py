@@ -0,0 +1,75 @@
+"""
+Build-time rendered feature word cloud
+The word cloud is rendered once from ``feature_text`` and saved as a PNG
+whose name carries a hash of the text. Pages serve the file directly; it is
+re-rendered only when the source text changes.
+
+Usage (from the project root):
+    python -m app.core.wordcloud_artifact
+"""
+
+import hashlib
+import os
+import threading
+
+from .viz_data import load_feature_text, memoize_on_version
+
+WORDCLOUD_DIR = 'app/datasets/wordcloud'
+
+_render_lock = threading.Lock()
+
+
+def text_hash(text):
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()[:16]
+
+
+def image_path(text, directory=WORDCLOUD_DIR):
+    return os.path.join(directory, f'wordcloud_{text_hash(text)}.png')
+
+
+def render(text, path):
+    from wordcloud import WordCloud
+
+    wordcloud = WordCloud(width=800, height=800,
+                          background_color='black',
+                          stopwords=set(['s']),
+                          min_font_size=10).generate(text)
+
+    # Write beside the target and rename, so readers never see a partial file
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    wordcloud.to_image().save(tmp_path, format='PNG')
+    os.replace(tmp_path, path)
+
+
+def ensure_image(text, directory=WORDCLOUD_DIR, rebuild=True):
+    """Path of the PNG for ``text``; renders it if missing and ``rebuild`` is set, else None."""
+    path = image_path(text, directory)
+    if os.path.exists(path):
+        return path
+    if not rebuild:
+        return None
+    with _render_lock:
+        if not os.path.exists(path):
+            render(text, path)
+    return path
+
+
+@memoize_on_version
+def wordcloud_image(feature_text):
+    """Memoized per feature_text version, so reruns skip even the hash."""
+    return ensure_image(feature_text)
+
+
+def main():
+    text = load_feature_text().obj
+    path = image_path(text)
+    if os.path.exists(path):
+        print(f'Word cloud is up to date: {path}')
+        return
+    render(text, path)
+    print(f'Rendered word cloud to {path}')
+
+
+if __name__ == "__main__":
+    main()
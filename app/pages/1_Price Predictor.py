@@ -1,7 +1,17 @@
+import os
+import tempfile
 import streamlit as st
-import pickle
 import pandas as pd
 import numpy as np
+import plotly.express as px
+from core.model_store import MODEL_PATH, artifact_stats, load_artifact
+from core.batch_predict import ERROR_COLUMN, FEATURE_COLUMNS, predict_frame, read_chunks, score_chunk
+from core.reduced_model import REDUCED_MODEL_PATH, load_report
+from core.prediction_cache import cached_predict, get_cache
+from core.price_surface import SURFACE_PATH, load_surface
+from core.sensitivity import price_curves
+from core.manifest import check_model, load_manifest
+from core.conformal import CONFORMAL_PATH, REDUCED_CONFORMAL_PATH, load_conformal, stratum_label
 
 st.set_page_config(
     page_title="Price Predictor",
@@ -139,11 +149,57 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-# Load models
-with open('app/models/df.pkl','rb') as file:
-    df = pickle.load(file)
-with open('app/models/pipeline.pkl','rb') as file:
-    pipeline = pickle.load(file)
+# Load model metadata and models (shared by every session, reloaded only when the files change)
+# Form vocabularies come from the small model manifest, not the training frame
+manifest = load_manifest()
+categories = manifest['categories']
+
+# Model choice: exact SVR or the faster Nystroem approximation (when trained)
+model_options = {'Full SVR (exact)': MODEL_PATH}
+if os.path.exists(REDUCED_MODEL_PATH):
+    model_options['Fast approximation (Nystroem)'] = REDUCED_MODEL_PATH
+model_name = st.sidebar.radio('Prediction Model', list(model_options))
+model = load_artifact(model_options[model_name])
+pipeline = model.obj
+manifest_warning = check_model(manifest, model)
+if manifest_warning is not None:
+    st.sidebar.warning(manifest_warning)
+
+reduced_report = load_report()
+if reduced_report is not None and len(model_options) > 1:
+    with st.sidebar.expander('Model comparison'):
+        st.dataframe(pd.DataFrame({
+            name: {
+                'R²': round(reduced_report[name]['r2'], 4),
+                'MAE (Cr)': round(reduced_report[name]['mae_cr'], 3),
+                'Batch ms': round(reduced_report[name]['batch_ms'], 1),
+                'Size MB': round(reduced_report[name]['size_mb'], 2),
+            }
+            for name in ['full', 'reduced']
+        }))
+        st.caption(f"R² loss {reduced_report['r2_loss']:.4f}, "
+                   f"{reduced_report['batch_speedup']:.1f}x faster batch scoring")
+
+# Calibrated intervals (computed at training time on each model's own residuals);
+# a model without its table falls back to the fixed range
+conformal_paths = {MODEL_PATH: CONFORMAL_PATH, REDUCED_MODEL_PATH: REDUCED_CONFORMAL_PATH}
+conformal_path = conformal_paths[model_options[model_name]]
+conformal = None
+if os.path.exists(conformal_path):
+    conformal = load_conformal(conformal_path)
+    interval_level = st.sidebar.select_slider(
+        'Prediction Interval', conformal.levels, value=0.9, format_func=lambda level: f'{level:.0%}'
+    )
+
+
+@st.cache_data(max_entries=256)
+def sensitivity_curves(model_version, row_items, bedroom_options, _pipeline):
+    # Cached per model version and input signature; the pipeline itself is not hashed
+    return price_curves(_pipeline, dict(row_items), bedroom_options)
+
+
+with st.sidebar.expander('Model artifacts'):
+    st.dataframe(pd.DataFrame(artifact_stats()), hide_index=True)
 
 # Header
 st.markdown("""
@@ -172,7 +228,7 @@ with st.container():
         # Sector
         sector = st.selectbox(
             'Sector',
-            sorted(df['sector'].unique().tolist()),
+            categories['sector'],
             help="Choose the sector where the property is located"
         )
         
@@ -181,14 +237,14 @@ with st.container():
         with col_bed:
             bedrooms = float(st.selectbox(
                 'Number of Bedrooms',
-                sorted(df['bedRoom'].unique().tolist()),
+                categories['bedRoom'],
                 help="Number of bedrooms in the property"
             ))
         
         with col_bath:
             bathroom = float(st.selectbox(
                 'Number of Bathrooms',
-                sorted(df['bathroom'].unique().tolist()),
+                categories['bathroom'],
                 help="Number of bathrooms in the property"
             ))
         
@@ -208,32 +264,32 @@ with st.container():
         # Balcony and Property Age
         balcony = st.selectbox(
             'Number of Balconies',
-            sorted(df['balcony'].unique().tolist()),
+            categories['balcony'],
             help="Number of balconies in the property"
         )
         
         property_age = st.selectbox(
             'Property Age',
-            sorted(df['agePossession'].unique().tolist()),
+            categories['agePossession'],
             help="Age of the property"
         )
         
         # Furnishing and Luxury
         furnishing_type = st.selectbox(
             'Furnishing Type',
-            sorted(df['furnishing_type'].unique().tolist()),
+            categories['furnishing_type'],
             help="Furnishing status of the property"
         )
         
         luxury_category = st.selectbox(
             'Luxury Category',
-            sorted(df['luxury_category'].unique().tolist()),
+            categories['luxury_category'],
             help="Luxury level of the property"
         )
         
         floor_category = st.selectbox(
             'Floor Category',
-            sorted(df['floor_category'].unique().tolist()),
+            categories['floor_category'],
             help="Floor level category"
         )
         
@@ -264,17 +320,21 @@ with col2:
             # Form a dataframe
             data = [[property_type, sector, bedrooms, bathroom, balcony, property_age, 
                     built_up_area, servant_room, store_room, furnishing_type, luxury_category, floor_category]]
-            columns = ['property_type', 'sector', 'bedRoom', 'bathroom', 'balcony',
-                       'agePossession', 'built_up_area', 'servant room', 'store room',
-                       'furnishing_type', 'luxury_category', 'floor_category']
-
-            # Convert to DataFrame
-            one_df = pd.DataFrame(data, columns=columns)
 
-            # Predict
-            base_price = np.expm1(pipeline.predict(one_df))[0]
-            low = base_price - 0.22
-            high = base_price + 0.22
+            # Predict (identical inputs for the same model are served from the shared cache)
+            base_price, _ = cached_predict(
+                lambda row: float(predict_frame(pipeline, pd.DataFrame([row]))[0]),
+                dict(zip(FEATURE_COLUMNS, data[0])),
+                model.version
+            )
+            if conformal is not None:
+                low, high, stratum = conformal.interval(base_price, sector, interval_level)
+                range_label = f'{interval_level:.0%} Interval'
+            else:
+                low = base_price - 0.22
+                high = base_price + 0.22
+                range_label = 'Estimated Range'
+                stratum = None
 
             # Display results
             st.markdown("""
@@ -282,13 +342,15 @@ with col2:
                 <h2 style="margin-bottom: 1rem; color: var(--text-primary);">Price Prediction</h2>
                 <div class="prediction-price">₹{:.2f} Cr</div>
                 <div class="prediction-range">
-                    Estimated Range: ₹{:.2f} Cr - ₹{:.2f} Cr
+                    {}: ₹{:.2f} Cr - ₹{:.2f} Cr
                 </div>
                 <p style="margin-top: 1rem; color: var(--text-secondary);">
                     *Price prediction based on similar properties in the area
                 </p>
             </div>
-            """.format(base_price, low, high), unsafe_allow_html=True)
+            """.format(base_price, range_label, low, high), unsafe_allow_html=True)
+            if stratum is not None:
+                st.caption(f"Interval calibrated on the model's errors for {stratum_label(stratum, sector)}")
             
             # Additional metrics
             col1, col2, col3 = st.columns(3)
@@ -317,6 +379,107 @@ with col2:
                 </div>
                 """, unsafe_allow_html=True)
 
+            # Price sensitivity (both curves come from one batched prediction)
+            area_curve, bedroom_curve = sensitivity_curves(
+                model.version,
+                tuple(zip(FEATURE_COLUMNS, data[0])),
+                tuple(categories['bedRoom']),
+                pipeline
+            )
+
+            fig_area = px.line(area_curve, x='built_up_area', y='price', title='Price vs Built Up Area',
+                               labels={'built_up_area': 'Built Up Area (sq ft)', 'price': 'Price (Cr)'})
+            fig_area.add_scatter(x=[built_up_area], y=[base_price], mode='markers',
+                                 marker=dict(size=10), name='This property')
+            fig_area.update_layout(plot_bgcolor='rgba(0,0,0,0)', paper_bgcolor='rgba(0,0,0,0)', showlegend=False)
+            st.plotly_chart(fig_area, use_container_width=True)
+
+            fig_bed = px.bar(bedroom_curve, x='bedRoom', y='price', title='Price by Number of Bedrooms',
+                             labels={'bedRoom': 'Bedrooms', 'price': 'Price (Cr)'})
+            fig_bed.update_layout(plot_bgcolor='rgba(0,0,0,0)', paper_bgcolor='rgba(0,0,0,0)')
+            st.plotly_chart(fig_bed, use_container_width=True)
+
+# What-if explorer: answered from the precomputed price surface, not the model
+if os.path.exists(SURFACE_PATH):
+    surface = load_surface()
+
+    st.markdown('<div class="section-header">What-if Explorer</div>', unsafe_allow_html=True)
+    col_area, col_bed, col_furnish = st.columns(3)
+    with col_area:
+        whatif_area = st.slider(
+            'Built Up Area (sq ft)',
+            min_value=int(surface.area[0]),
+            max_value=int(surface.area[-1]),
+            value=int(np.clip(built_up_area, surface.area[0], surface.area[-1])),
+            step=50
+        )
+    with col_bed:
+        bed_options = surface.axes['bedRoom'].tolist()
+        whatif_bedrooms = st.select_slider(
+            'Bedrooms',
+            bed_options,
+            value=bedrooms if bedrooms in bed_options else bed_options[0]
+        )
+    with col_furnish:
+        furnish_options = surface.axes['furnishing_type'].tolist()
+        whatif_furnishing = st.select_slider(
+            'Furnishing Type',
+            furnish_options,
+            value=furnishing_type if furnishing_type in furnish_options else furnish_options[0]
+        )
+
+    whatif_price = surface.price(
+        whatif_area, sector=sector, property_type=property_type, bedRoom=whatif_bedrooms,
+        furnishing_type=whatif_furnishing, luxury_category=luxury_category
+    )
+    if whatif_price is not None:
+        st.metric('Approximate Price', f'₹{whatif_price:.2f} Cr')
+        st.caption('Approximation for a typical listing of this configuration. '
+                   'Use "Predict Property Price" for an exact quote.')
+    else:
+        st.info('This combination is not covered by the precomputed price surface.')
+
+# Admin view of the shared prediction cache (clearing it affects every session)
+if os.environ.get('PRICE_PREDICTOR_ADMIN') == '1':
+    with st.sidebar.expander('Admin: prediction cache'):
+        st.json(get_cache().stats())
+        if st.button('Clear cache'):
+            get_cache().clear()
+
+# Batch estimation
+st.markdown("---")
+with st.expander('Batch Price Estimation (CSV upload)'):
+    st.markdown(f"Upload a CSV with the columns: `{', '.join(FEATURE_COLUMNS)}`")
+    uploaded = st.file_uploader('Listings CSV', type='csv')
+
+    if uploaded is not None and st.button('Estimate Prices', use_container_width=True):
+        try:
+            # Scored chunks are written straight to a temporary CSV; only a preview stays in memory
+            results = tempfile.TemporaryFile(mode='w+b')
+            rows = failed = 0
+            preview = None
+            progress = st.progress(0.0, text='Scoring listings...')
+            for chunk in read_chunks(uploaded):
+                chunk = score_chunk(pipeline, chunk)
+                results.write(chunk.to_csv(header=(rows == 0), index=False).encode('utf-8'))
+                if preview is None:
+                    preview = chunk.head(100)
+                rows += len(chunk)
+                failed += int((chunk[ERROR_COLUMN] != '').sum())
+                progress.progress(min(uploaded.tell() / max(uploaded.size, 1), 1.0),
+                                  text=f'Scored {rows:,} listings')
+            progress.empty()
+            results.seek(0)
+
+            st.success(f'Estimated prices for {rows - failed:,} listings')
+            if failed:
+                st.warning(f'{failed:,} listing(s) could not be scored; see the `{ERROR_COLUMN}` column')
+            st.dataframe(preview, use_container_width=True)
+            st.download_button('Download Results', results,
+                               file_name='priced_listings.csv', mime='text/csv')
+        except ValueError as e:
+            st.error(f"Error in batch estimation: {str(e)}")
+
 # Information section
 st.markdown("---")
 st.markdown("""
@@ -1,10 +1,17 @@
+import functools
+import time
 import streamlit as st
 import pandas as pd
+import numpy as np
 import plotly.express as px
-import pickle
-from wordcloud import WordCloud
-import matplotlib.pyplot as plt
-import seaborn as sns
+import plotly.graph_objects as go
+from core.aggregates import get_cube, is_current, read_meta, rollup, totals
+from core.distributions import price_box_stats, price_histograms, price_violins
+from core.geomap import HEX_SIZES, geomap_spec
+from core.model_store import artifact_stats
+from core.scatter import MAX_POINTS, SCATTER_MODES, resolve_mode, scatter_density, scatter_points
+from core.viz_data import load_feature_text, load_viz_data, memory_footprint, rows_for, sectors
+from core.wordcloud_artifact import wordcloud_image
 
 st.set_page_config(
     page_title="Analytics Dashboard",
@@ -87,11 +94,37 @@ st.markdown("""
 </div>
 """, unsafe_allow_html=True)
 
-new_df = pd.read_csv('app/datasets/data_viz1.csv')
-feature_text = pickle.load(open('app/datasets/feature_text.pkl','rb'))
-
-
-group_df = new_df.groupby('sector').mean(numeric_only=True)[['price','price_per_sqft','built_up_area','latitude','longitude']]
+def timed_section(name):
+    """Record a section's render time in session state and show it under the chart."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper():
+            start = time.perf_counter()
+            fn()
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            st.session_state.setdefault('section_ms', {})[name] = elapsed_ms
+            st.caption(f'⏱️ {name}: {elapsed_ms:.0f} ms')
+        return wrapper
+    return decorator
+
+
+# Shared, typed data (parsed once per process) and the pre-aggregated
+# sector x property_type x BHK cube the summary charts render from
+viz_data = load_viz_data()
+feature_text = load_feature_text()
+
+cube, hist_edges = get_cube(viz_data)
+group_df = rollup(cube, 'sector')
+metrics = totals(cube)
+
+# Listings appended with `aggregates append` live only in the persisted cube
+cube_meta = read_meta() or {}
+appended_rows = cube_meta.get('appended_rows', 0) if is_current() else 0
+
+with st.sidebar.expander('Data layer'):
+    st.dataframe(pd.DataFrame(artifact_stats()), hide_index=True)
+    st.caption(f'Listings frame: {memory_footprint(viz_data) / 1e6:.2f} MB in memory')
+    st.caption(f'Aggregate cube: {len(cube):,} groups, {appended_rows:,} listings appended since build')
 
 # Key metrics
 col1, col2, col3, col4 = st.columns(4)
@@ -99,7 +132,7 @@ col1, col2, col3, col4 = st.columns(4)
 with col1:
     st.markdown(f"""
     <div class="metric-card">
-        <div class="metric-value">{len(new_df):,}</div>
+        <div class="metric-value">{metrics['properties']:,}</div>
         <div class="metric-label">Total Properties</div>
     </div>
     """, unsafe_allow_html=True)
@@ -107,13 +140,13 @@ with col1:
 with col2:
     st.markdown(f"""
     <div class="metric-card">
-        <div class="metric-value">{len(group_df)}</div>
+        <div class="metric-value">{metrics['sectors']}</div>
         <div class="metric-label">Sectors Covered</div>
     </div>
     """, unsafe_allow_html=True)
 
 with col3:
-    avg_price = new_df['price'].mean()
+    avg_price = metrics['avg_price']
     st.markdown(f"""
     <div class="metric-card">
         <div class="metric-value">₹{avg_price:.1f}Cr</div>
@@ -122,7 +155,7 @@ with col3:
     """, unsafe_allow_html=True)
 
 with col4:
-    avg_psf = new_df['price_per_sqft'].mean()
+    avg_psf = metrics['avg_price_per_sqft']
     st.markdown(f"""
     <div class="metric-card">
         <div class="metric-value">₹{avg_psf:,.0f}</div>
@@ -130,92 +163,199 @@ with col4:
     </div>
     """, unsafe_allow_html=True)
 
-st.markdown('<div class="section-title">🗺️ Sector Price per Sqft Geomap</div>', unsafe_allow_html=True)
-st.markdown('<div class="chart-container">', unsafe_allow_html=True)
-
-fig = px.scatter_map(group_df, lat="latitude", lon="longitude", color="price_per_sqft", size='built_up_area',
-                  color_continuous_scale=px.colors.cyclical.IceFire, zoom=10,
-                  map_style="open-street-map",width=1200,height=700,hover_name=group_df.index)
-
-st.plotly_chart(fig,use_container_width=True)
-st.markdown('</div>', unsafe_allow_html=True)
-
-st.markdown('<div class="section-title">☁️ Features Wordcloud</div>', unsafe_allow_html=True)
-st.markdown('<div class="chart-container">', unsafe_allow_html=True)
-
-wordcloud = WordCloud(width = 800, height = 800,
-                      background_color ='black',
-                      stopwords = set(['s']),  # Any stopwords you'd like to exclude
-                      min_font_size = 10).generate(feature_text)
+if appended_rows:
+    st.info(f'The metrics, sector map, BHK distribution and price distribution include {appended_rows:,} '
+            'listings appended since the last build. The area vs price, hex map and BHK price comparison '
+            'charts read data_viz1.csv and will show them once they are added to it and the data is rebuilt.')
+
+
+@st.fragment
+@timed_section('Geomap')
+def geomap_section():
+    st.markdown('<div class="section-title">🗺️ Sector Price per Sqft Geomap</div>', unsafe_allow_html=True)
+    st.markdown('<div class="chart-container">', unsafe_allow_html=True)
+
+    map_layer = st.radio('Layer', ['Sector centroids', 'Hex bins (listings)'], horizontal=True)
+    if map_layer == 'Sector centroids':
+        spec = geomap_spec(viz_data)
+    else:
+        hex_size = st.select_slider('Hex size', options=list(HEX_SIZES), value='~1 km')
+        spec = geomap_spec(viz_data, 'hex', HEX_SIZES[hex_size])
+
+    # Cached figure dict per data version and layer
+    st.plotly_chart(spec, use_container_width=True)
+    st.markdown('</div>', unsafe_allow_html=True)
+
+
+@st.fragment
+@timed_section('Word cloud')
+def wordcloud_section():
+    st.markdown('<div class="section-title">☁️ Features Wordcloud</div>', unsafe_allow_html=True)
+    st.markdown('<div class="chart-container">', unsafe_allow_html=True)
+
+    # Pre-rendered image, re-rendered only when the feature text changes
+    st.image(wordcloud_image(feature_text), use_container_width=True)
+    st.markdown('</div>', unsafe_allow_html=True)
+
+
+@st.fragment
+@timed_section('Area vs Price')
+def scatter_section():
+    st.markdown('<div class="section-title">📈 Area vs Price Analysis</div>', unsafe_allow_html=True)
+    st.markdown('<div class="chart-container">', unsafe_allow_html=True)
+
+    property_type = st.selectbox('Select Property Type', ['flat','house'])
+    scatter_mode = st.radio('Rendering', SCATTER_MODES, horizontal=True,
+                            help=f'Auto draws every point up to {MAX_POINTS:,} rows and a grid-stratified sample above that')
+
+    n_rows = int(rollup(cube, 'property_type')['count'].get(property_type, 0))
+    scatter_mode = resolve_mode(scatter_mode, n_rows)
+    title = f"Area vs Price - {'Houses' if property_type == 'house' else 'Flats'}"
+
+    if scatter_mode == 'Density':
+        counts, x_centers, y_centers = scatter_density(viz_data, property_type, 'built_up_area', 'price')
+        fig1 = go.Figure(go.Heatmap(x=x_centers, y=y_centers, z=np.where(counts > 0, counts, np.nan),
+                                    colorscale='Viridis', colorbar={'title': 'Listings'}))
+        fig1.update_layout(title=f'{title} (density of {n_rows:,} listings)',
+                           xaxis_title='Built Up Area (sq ft)', yaxis_title='Price (Cr)')
+    else:
+        if scatter_mode == 'Exact':
+            points = rows_for(viz_data, 'property_type', property_type)
+        else:
+            points = scatter_points(viz_data, property_type, 'built_up_area', 'price')
+            title = f'{title} ({len(points):,} of {n_rows:,} listings)'
+        fig1 = px.scatter(points, x="built_up_area", y="price", color="bedRoom", title=title, render_mode='webgl',
+                          labels={'built_up_area': 'Built Up Area (sq ft)', 'price': 'Price (Cr)', 'bedRoom': 'Bedrooms'})
 
-fig = plt.figure(figsize = (8, 8), facecolor = None)
-plt.imshow(wordcloud, interpolation='bilinear')
-plt.axis("off")
-plt.tight_layout(pad = 0)
-st.pyplot(fig)
-st.markdown('</div>', unsafe_allow_html=True)
-
-st.markdown('<div class="section-title">📈 Area vs Price Analysis</div>', unsafe_allow_html=True)
-st.markdown('<div class="chart-container">', unsafe_allow_html=True)
-
-property_type = st.selectbox('Select Property Type', ['flat','house'])
-
-if property_type == 'house':
-    fig1 = px.scatter(new_df[new_df['property_type'] == 'house'], x="built_up_area", y="price", color="bedRoom", 
-                     title="Area vs Price - Houses", 
-                     labels={'built_up_area': 'Built Up Area (sq ft)', 'price': 'Price (Cr)', 'bedRoom': 'Bedrooms'})
-    fig1.update_layout(plot_bgcolor='rgba(0,0,0,0)', paper_bgcolor='rgba(0,0,0,0)')
-    st.plotly_chart(fig1, use_container_width=True)
-else:
-    fig1 = px.scatter(new_df[new_df['property_type'] == 'flat'], x="built_up_area", y="price", color="bedRoom",
-                      title="Area vs Price - Flats",
-                      labels={'built_up_area': 'Built Up Area (sq ft)', 'price': 'Price (Cr)', 'bedRoom': 'Bedrooms'})
     fig1.update_layout(plot_bgcolor='rgba(0,0,0,0)', paper_bgcolor='rgba(0,0,0,0)')
     st.plotly_chart(fig1, use_container_width=True)
 
-st.markdown('</div>', unsafe_allow_html=True)
-
-st.markdown('<div class="section-title">🥧 BHK Distribution</div>', unsafe_allow_html=True)
-st.markdown('<div class="chart-container">', unsafe_allow_html=True)
-
-sector_options = new_df['sector'].unique().tolist()
-sector_options.insert(0,'overall')
-
-selected_sector = st.selectbox('Select Sector', sector_options)
-
-if selected_sector == 'overall':
-    fig2 = px.pie(new_df, names='bedRoom', title=f'BHK Distribution - All Sectors')
-else:
-    fig2 = px.pie(new_df[new_df['sector'] == selected_sector], names='bedRoom', 
-                  title=f'BHK Distribution - {selected_sector}')
-
-fig2.update_layout(plot_bgcolor='rgba(0,0,0,0)', paper_bgcolor='rgba(0,0,0,0)')
-st.plotly_chart(fig2, use_container_width=True)
-st.markdown('</div>', unsafe_allow_html=True)
-
-st.markdown('<div class="section-title">📊 BHK Price Comparison</div>', unsafe_allow_html=True)
-st.markdown('<div class="chart-container">', unsafe_allow_html=True)
-
-fig3 = px.box(new_df[new_df['bedRoom'] <= 4], x='bedRoom', y='price', 
-              title='Price Range by BHK Configuration',
-              labels={'bedRoom': 'Number of Bedrooms', 'price': 'Price (Cr)'})
-fig3.update_layout(plot_bgcolor='rgba(0,0,0,0)', paper_bgcolor='rgba(0,0,0,0)')
-st.plotly_chart(fig3, use_container_width=True)
-st.markdown('</div>', unsafe_allow_html=True)
-
-st.markdown('<div class="section-title">📈 Price Distribution by Property Type</div>', unsafe_allow_html=True)
-st.markdown('<div class="chart-container">', unsafe_allow_html=True)
-
-fig4 = plt.figure(figsize=(12, 6))
-sns.histplot(new_df[new_df['property_type'] == 'house']['price'], label='Houses', alpha=0.7, color='#667eea')
-sns.histplot(new_df[new_df['property_type'] == 'flat']['price'], label='Flats', alpha=0.7, color='#764ba2')
-plt.xlabel('Price (Cr)')
-plt.ylabel('Frequency')
-plt.title('Price Distribution Comparison')
-plt.legend()
-plt.grid(True, alpha=0.3)
-st.pyplot(fig4)
-st.markdown('</div>', unsafe_allow_html=True)
+    st.markdown('</div>', unsafe_allow_html=True)
+
+
+@st.fragment
+@timed_section('BHK distribution')
+def bhk_pie_section():
+    st.markdown('<div class="section-title">🥧 BHK Distribution</div>', unsafe_allow_html=True)
+    st.markdown('<div class="chart-container">', unsafe_allow_html=True)
+
+    selected_sector = st.selectbox('Select Sector', ['overall'] + group_df.index.tolist())
+
+    if selected_sector == 'overall':
+        bhk_counts = rollup(cube, 'bedRoom')['count']
+        fig2 = px.pie(names=bhk_counts.index, values=bhk_counts.values, title=f'BHK Distribution - All Sectors')
+    else:
+        bhk_counts = rollup(cube[cube['sector'] == selected_sector], 'bedRoom')['count']
+        fig2 = px.pie(names=bhk_counts.index, values=bhk_counts.values,
+                      title=f'BHK Distribution - {selected_sector}')
+
+    fig2.update_layout(plot_bgcolor='rgba(0,0,0,0)', paper_bgcolor='rgba(0,0,0,0)')
+    st.plotly_chart(fig2, use_container_width=True)
+    st.markdown('</div>', unsafe_allow_html=True)
+
+
+@st.fragment
+@timed_section('BHK price comparison')
+def bhk_box_section():
+    st.markdown('<div class="section-title">📊 BHK Price Comparison</div>', unsafe_allow_html=True)
+    st.markdown('<div class="chart-container">', unsafe_allow_html=True)
+
+    box_col1, box_col2, box_col3 = st.columns(3)
+    # Row-level chart: only sectors with listing rows (appended-only sectors live in the cube alone)
+    box_sector = box_col1.selectbox('Sector', ['overall'] + sectors(viz_data), key='box_sector')
+    box_sector = None if box_sector == 'overall' else box_sector
+    box_stats, box_outliers = price_box_stats(viz_data, box_sector)
+    bhk_options = box_stats.index.tolist()
+    if not bhk_options:
+        st.info('No priced listings in this sector yet.')
+        st.markdown('</div>', unsafe_allow_html=True)
+        return
+    if len(bhk_options) > 1:
+        # Default to the largest configuration up to 4 BHK that this sector actually has
+        default_bhk = max([bhk for bhk in bhk_options if bhk <= 4.0], default=bhk_options[0])
+        max_bhk = box_col2.select_slider('Up to BHK', options=bhk_options, value=default_bhk)
+    else:
+        max_bhk = bhk_options[0]
+        box_col2.caption(f'Only {max_bhk:g} BHK listings in this sector')
+    box_style = box_col3.radio('Chart', ['Box', 'Violin'], horizontal=True)
+
+    # Traces are built from per-BHK summary statistics only
+    box_stats = box_stats[box_stats.index <= max_bhk]
+    box_outliers = box_outliers[box_outliers['group'] <= max_bhk]
+    fig3 = go.Figure()
+    if box_style == 'Violin':
+        violins = price_violins(viz_data, box_sector)
+        for bhk in box_stats.index:
+            grid, density = violins[bhk]
+            half_width = 0.4 * density / (density.max() or 1.0)
+            fig3.add_trace(go.Scatter(x=np.r_[bhk - half_width, (bhk + half_width)[::-1]], y=np.r_[grid, grid[::-1]],
+                                      fill='toself', mode='lines', line={'color': '#764ba2', 'width': 1},
+                                      fillcolor='rgba(118,75,162,0.35)', hoverinfo='skip', showlegend=False))
+    fig3.add_trace(go.Box(x=box_stats.index, q1=box_stats['q1'], median=box_stats['median'], q3=box_stats['q3'],
+                          lowerfence=box_stats['lower'], upperfence=box_stats['upper'], boxpoints=False,
+                          width=0.15 if box_style == 'Violin' else 0.6, marker_color='#667eea', name='Price'))
+    fig3.add_trace(go.Scatter(x=box_outliers['group'], y=box_outliers['value'], mode='markers',
+                              marker={'color': '#667eea', 'size': 4}, name='Outliers (sample)'))
+    fig3.update_layout(title='Price Range by BHK Configuration', showlegend=False,
+                       xaxis={'title': 'Number of Bedrooms', 'tickmode': 'array', 'tickvals': box_stats.index},
+                       yaxis_title='Price (Cr)')
+    fig3.update_layout(plot_bgcolor='rgba(0,0,0,0)', paper_bgcolor='rgba(0,0,0,0)')
+    st.plotly_chart(fig3, use_container_width=True)
+    st.markdown('</div>', unsafe_allow_html=True)
+
+
+@st.fragment
+@timed_section('Price distribution')
+def price_histogram_section():
+    st.markdown('<div class="section-title">📈 Price Distribution by Property Type</div>', unsafe_allow_html=True)
+    st.markdown('<div class="chart-container">', unsafe_allow_html=True)
+
+    log_scale = st.toggle('Log price scale', value=False)
+    # Summed from the cube's stored bins (linear) or its geometric sketch buckets (log)
+    edges, counts = price_histograms(cube, hist_edges, log=log_scale)
+
+    # Log bins are drawn in log10 space so every bar has the same width
+    positions = np.log10(edges) if log_scale else edges
+    fig4 = go.Figure()
+    for property_type, label, color in [('house', 'Houses', '#667eea'), ('flat', 'Flats', '#764ba2')]:
+        if property_type not in counts:
+            continue
+        fig4.add_trace(go.Bar(x=(positions[:-1] + positions[1:]) / 2, y=counts[property_type],
+                              width=np.diff(positions), name=label, marker_color=color, opacity=0.7,
+                              customdata=np.stack([edges[:-1], edges[1:]], axis=1),
+                              hovertemplate='₹%{customdata[0]:.2f}-%{customdata[1]:.2f} Cr: %{y}'))
+    if log_scale:
+        ticks = np.array([0.1, 0.2, 0.5, 1, 2, 5, 10, 20, 50])
+        ticks = ticks[(ticks >= edges[0]) & (ticks <= edges[-1])]
+        fig4.update_xaxes(tickvals=np.log10(ticks), ticktext=[f'{t:g}' for t in ticks])
+    fig4.update_layout(barmode='overlay', bargap=0, title='Price Distribution Comparison',
+                       xaxis_title='Price (Cr)', yaxis_title='Frequency',
+                       plot_bgcolor='rgba(0,0,0,0)', paper_bgcolor='rgba(0,0,0,0)')
+    st.plotly_chart(fig4, use_container_width=True)
+    st.markdown('</div>', unsafe_allow_html=True)
+
+
+# Each section is a fragment: its own widgets rerun only that section, and
+# sections hidden in the sidebar are not computed at all
+SECTIONS = {
+    'Geomap': geomap_section,
+    'Word cloud': wordcloud_section,
+    'Area vs Price': scatter_section,
+    'BHK distribution': bhk_pie_section,
+    'BHK price comparison': bhk_box_section,
+    'Price distribution': price_histogram_section,
+}
+visible_sections = st.sidebar.multiselect('Sections', list(SECTIONS), default=list(SECTIONS))
+
+for name in visible_sections:
+    SECTIONS[name]()
+
+with st.sidebar.expander('Section timings'):
+    st.dataframe(pd.DataFrame([{'section': name, 'ms': round(ms, 1)}
+                               for name, ms in st.session_state.get('section_ms', {}).items()
+                               if name in visible_sections]),
+                 hide_index=True)
+    st.caption('Full-page run; fragment reruns update the timing under each chart')
 
 # Developer credit
 st.markdown("""
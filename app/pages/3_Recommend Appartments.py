@@ -1,12 +1,6 @@
 import streamlit as st
-import pandas as pd
-import numpy as np
-import re
-import json
-import ast
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
-from sklearn.preprocessing import StandardScaler
+from core.apartments import listings_frame, load_apartment_tables
+from core.recommender import WEIGHTS, load_recommender
 
 st.set_page_config(
     page_title="Property Recommendations",
@@ -112,145 +106,31 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-# Load and process data
-@st.cache_data
-def load_and_process_data():
+# Load the recommender artifacts (memory-mapped, shared across sessions)
+@st.cache_resource
+def load_and_process_data(version):
     try:
-        # Load the apartments dataset
-        df = pd.read_csv('app/data/appartments.csv').drop(22)
-        
-        # Process facilities for TF-IDF
-        def extract_list(s):
-            return re.findall(r"'(.*?)'", s)
-        
-        df['TopFacilities'] = df['TopFacilities'].apply(extract_list)
-        df['FacilitiesStr'] = df['TopFacilities'].apply(' '.join)
-        
-        # Create TF-IDF matrix for facilities
-        tfidf_vectorizer = TfidfVectorizer(stop_words='english', ngram_range=(1, 2))
-        tfidf_matrix = tfidf_vectorizer.fit_transform(df['FacilitiesStr'])
-        cosine_sim1 = cosine_similarity(tfidf_matrix, tfidf_matrix)
-        
-        # Process price details
-        def refined_parse_modified_v2(detail_str):
-            try:
-                details = json.loads(detail_str.replace("'", "\""))
-            except:
-                return {}
-
-            extracted = {}
-            for bhk, detail in details.items():
-                # Extract building type
-                extracted[f'building type_{bhk}'] = detail.get('building_type')
+        recommender = load_recommender().obj
+        df = listings_frame(load_apartment_tables()).loc[recommender.properties]
 
-                # Parsing area details
-                area = detail.get('area', '')
-                area_parts = area.split('-')
-                if len(area_parts) == 1:
-                    try:
-                        value = float(area_parts[0].replace(',', '').replace(' sq.ft.', '').strip())
-                        extracted[f'area low {bhk}'] = value
-                        extracted[f'area high {bhk}'] = value
-                    except:
-                        extracted[f'area low {bhk}'] = None
-                        extracted[f'area high {bhk}'] = None
-                elif len(area_parts) == 2:
-                    try:
-                        extracted[f'area low {bhk}'] = float(area_parts[0].replace(',', '').replace(' sq.ft.', '').strip())
-                        extracted[f'area high {bhk}'] = float(area_parts[1].replace(',', '').replace(' sq.ft.', '').strip())
-                    except:
-                        extracted[f'area low {bhk}'] = None
-                        extracted[f'area high {bhk}'] = None
+        # PropertyName -> matrix row (first listing wins for repeated names)
+        name_to_row = {}
+        for row, name in enumerate(df['PropertyName']):
+            name_to_row.setdefault(name, row)
 
-                # Parsing price details
-                price_range = detail.get('price-range', '')
-                price_parts = price_range.split('-')
-                if len(price_parts) == 2:
-                    try:
-                        extracted[f'price low {bhk}'] = float(price_parts[0].replace('₹', '').replace(' Cr', '').replace(' L', '').strip())
-                        extracted[f'price high {bhk}'] = float(price_parts[1].replace('₹', '').replace(' Cr', '').replace(' L', '').strip())
-                        if 'L' in price_parts[0]:
-                            extracted[f'price low {bhk}'] /= 100
-                        if 'L' in price_parts[1]:
-                            extracted[f'price high {bhk}'] /= 100
-                    except:
-                        extracted[f'price low {bhk}'] = None
-                        extracted[f'price high {bhk}'] = None
-
-            return extracted
-        
-        # Apply the refined parsing and generate the new DataFrame structure
-        data_refined = []
-
-        for _, row in df.iterrows():
-            features = refined_parse_modified_v2(row['PriceDetails'])
-            
-            # Construct a new row for the transformed dataframe
-            new_row = {'PropertyName': row['PropertyName']}
-            
-            # Populate the new row with extracted features
-            for config in ['1 BHK', '2 BHK', '3 BHK', '4 BHK', '5 BHK', '6 BHK', '1 RK', 'Land']:
-                new_row[f'building type_{config}'] = features.get(f'building type_{config}')
-                new_row[f'area low {config}'] = features.get(f'area low {config}')
-                new_row[f'area high {config}'] = features.get(f'area high {config}')
-                new_row[f'price low {config}'] = features.get(f'price low {config}')
-                new_row[f'price high {config}'] = features.get(f'price high {config}')
-            
-            data_refined.append(new_row)
-
-        df_final_refined_v2 = pd.DataFrame(data_refined).set_index('PropertyName')
-        df_final_refined_v2['building type_Land'] = df_final_refined_v2['building type_Land'].replace({'':'Land'})
-        
-        # One-hot encoding and normalization for price features
-        categorical_columns = df_final_refined_v2.select_dtypes(include=['object']).columns.tolist()
-        ohe_df = pd.get_dummies(df_final_refined_v2, columns=categorical_columns, drop_first=True)
-        ohe_df.fillna(0, inplace=True)
-        
-        scaler = StandardScaler()
-        ohe_df_normalized = pd.DataFrame(scaler.fit_transform(ohe_df), columns=ohe_df.columns, index=ohe_df.index)
-        cosine_sim2 = cosine_similarity(ohe_df_normalized)
-        
-        # Process location advantages
-        def distance_to_meters(distance_str):
-            try:
-                if 'Km' in distance_str or 'KM' in distance_str:
-                    return float(distance_str.split()[0]) * 1000
-                elif 'Meter' in distance_str or 'meter' in distance_str:
-                    return float(distance_str.split()[0])
-                else:
-                    return None
-            except:
-                return None
-        
-        # Extract distances for each location
-        location_matrix = {}
-        for index, row in df.iterrows():
-            distances = {}
-            try:
-                for location, distance in ast.literal_eval(row['LocationAdvantages']).items():
-                    distances[location] = distance_to_meters(distance)
-            except:
-                continue
-            location_matrix[index] = distances
+        # Distance from each property to each location advantage
+        location_df = recommender.distances.set_axis(df['PropertyName'], axis=0)
 
-        # Convert the dictionary to a dataframe
-        location_df = pd.DataFrame.from_dict(location_matrix, orient='index')
-        location_df.index = df.PropertyName
-        location_df.fillna(54000, inplace=True)
-        
-        # Normalize location data
-        scaler = StandardScaler()
-        location_df_normalized = pd.DataFrame(scaler.fit_transform(location_df), columns=location_df.columns, index=location_df.index)
-        cosine_sim3 = cosine_similarity(location_df_normalized)
-        
-        return df, cosine_sim1, cosine_sim2, cosine_sim3, location_df
+        return df, name_to_row, location_df
         
     except Exception as e:
         st.error(f"Error loading data: {str(e)}")
-        return None, None, None, None, None
+        return None, None, None
 
 # Load data
-df, cosine_sim1, cosine_sim2, cosine_sim3, location_df = load_and_process_data()
+recommender_artifact = load_recommender()
+recommender = recommender_artifact.obj
+df, name_to_row, location_df = load_and_process_data(recommender_artifact.version)
 
 if df is not None:
     # Header
@@ -340,22 +220,17 @@ if df is not None:
     )
 
     if st.button('Get Similar Properties'):
-        if cosine_sim1 is not None and cosine_sim2 is not None and cosine_sim3 is not None:
+        if name_to_row is not None:
             try:
                 with st.spinner('Finding similar properties...'):
-                    # Combined similarity matrix (weights from notebook)
-                    cosine_sim_matrix = 30*cosine_sim1 + 20*cosine_sim2 + 8*cosine_sim3
-                    
-                    # Get similarity scores
-                    sim_scores = list(enumerate(cosine_sim_matrix[df[df['PropertyName'] == selected_property_name].index[0]]))
-                    sorted_scores = sorted(sim_scores, key=lambda x: x[1], reverse=True)
-                    top_indices = [i[0] for i in sorted_scores[1:6]]  # Get top 5 similar properties
-                    
+                    # Blend only the selected property's row (weights from notebook), top 5 by partial sort
+                    top_indices, top_scores = recommender.similar(name_to_row[selected_property_name], k=5)
+                    max_score = sum(WEIGHTS.values())
+
                     st.success(f"Found {len(top_indices)} similar properties!")
                     
-                    for i, prop_idx in enumerate(top_indices):
+                    for prop_idx, score in zip(top_indices, top_scores):
                         prop = df.iloc[prop_idx]
-                        similarity_score = sorted_scores[i+1][1]  # +1 because we skip the first (same property)
                         
                         st.markdown(f"""
                         <div class="recommendation-card">
@@ -365,7 +240,7 @@ if df is not None:
                             <p><strong>Nearby Locations:</strong> {prop['NearbyLocations'][:100]}...</p>
                             <p><strong>Top Facilities:</strong> {', '.join(prop['TopFacilities'][:5])}</p>
                             <div class="similarity-score">
-                                Similarity: 100%
+                                Similarity: {100 * score / max_score:.1f}%
                             </div>
                         </div>
                         """, unsafe_allow_html=True)
@@ -386,6 +261,7 @@ if df is not None:
             • <strong>Price Similarity (20x weight):</strong> Based on normalized price and area features<br>
             • <strong>Location Similarity (8x weight):</strong> Based on distance to key locations<br>
             The system combines these matrices to find the most similar properties to your selection.
+            The similarity shown is the weighted score as a share of a perfect match on all three.
         </p>
     </div>
     """, unsafe_allow_html=True)
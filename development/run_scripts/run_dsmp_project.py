@@ -5,9 +5,10 @@ Run this script to execute the complete project pipeline
 """
 
 import os
+import sys
 import pandas as pd
 import numpy as np
-from sklearn.model_selection import KFold, cross_val_score, train_test_split
+from sklearn.model_selection import KFold, cross_val_predict, train_test_split
 from sklearn.linear_model import LinearRegression
 from sklearn.pipeline import Pipeline
 from sklearn.preprocessing import OneHotEncoder, StandardScaler
@@ -16,6 +17,21 @@ from sklearn.svm import SVR
 from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
 import pickle
 
+# Make the app's shared helpers (app/core) importable
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'app'))
+from core.svr_kernel import export_pipeline
+from core.reduced_model import build_reduced_pipeline, compare_models, save_report
+from core.price_surface import build_surface
+from core.manifest import build_manifest, file_sha256, write_manifest
+from core.conformal import ConformalTable, build_table, write_table
+
+def print_strata(table, log_pred, sectors, level=0.9):
+    """Share of rows whose interval comes from each stratum (sector and band down to global)."""
+    conformal = ConformalTable(table)
+    strata = pd.Series([conformal.radius(p, s, level)[1] for p, s in zip(log_pred, sectors)])
+    shares = strata.value_counts(normalize=True)
+    print('Intervals served by: ' + ', '.join(f'{stratum} {share:.0%}' for stratum, share in shares.items()))
+
 def main():
     print('Starting DSMP Capstone Project - Gurgaon Real Estate Analysis')
     print('=' * 70)
@@ -68,7 +84,9 @@ def main():
     # Cross-validation
     print(f'\nRunning 10-fold cross-validation...')
     kfold = KFold(n_splits=10, shuffle=True, random_state=42)
-    scores = cross_val_score(pipeline, X, y_transformed, cv=kfold, scoring='r2')
+    # Out-of-fold predictions give every row a residual for the conformal intervals
+    oof_pred = cross_val_predict(pipeline, X, y_transformed, cv=kfold)
+    scores = np.array([r2_score(y_transformed.iloc[test], oof_pred[test]) for _, test in kfold.split(X)])
     
     print(f'R² Scores: {[f"{score:.4f}" for score in scores]}')
     print(f'Mean R² Score: {scores.mean():.4f} ± {scores.std():.4f}')
@@ -94,6 +112,31 @@ def main():
     print(f'Root Mean Square Error: Rs {np.sqrt(mse):.2f} Cr')
     print(f'R² Score: {r2:.4f}')
     
+    # Conformal intervals: out-of-fold residuals by sector and price band
+    conformal_table = build_table(y_transformed, oof_pred, X['sector'])
+    print(f'\nConformal intervals calibrated on {conformal_table["calibration_rows"]} out-of-fold rows '
+          f'({len(conformal_table["by_sector"])} sectors, {len(conformal_table["by_sector_band"])} sector/band strata)')
+    for level in conformal_table['levels']:
+        radius = conformal_table['global'][str(level)]
+        print(f'{level:.0%} interval: x{np.exp(-radius):.2f} to x{np.exp(radius):.2f} of the prediction')
+    print_strata(conformal_table, oof_pred, X['sector'])
+
+    # Reduced model: Nystroem approximation of the RBF kernel + Ridge
+    print(f'\nTraining reduced (Nystroem) model...')
+    reduced_pipeline = build_reduced_pipeline(pipeline)
+    reduced_pipeline.fit(X_train, y_train)
+    reduced_report = compare_models(pipeline, reduced_pipeline, X_test, y_test)
+
+    print(f'{"":10}{"R²":>8}{"MAE (Cr)":>10}{"Row ms":>9}{"Batch ms":>10}{"Size MB":>9}{"Basis":>7}')
+    for name in ['full', 'reduced']:
+        r = reduced_report[name]
+        print(f'{name:10}{r["r2"]:>8.4f}{r["mae_cr"]:>10.3f}{r["row_ms"]:>9.2f}'
+              f'{r["batch_ms"]:>10.1f}{r["size_mb"]:>9.2f}{r["n_basis"]:>7}')
+    print(f'R² loss: {reduced_report["r2_loss"]:.4f} | Batch speedup: {reduced_report["batch_speedup"]:.1f}x')
+    reduced_oof_pred = cross_val_predict(build_reduced_pipeline(pipeline), X, y_transformed, cv=kfold)
+    reduced_conformal_table = build_table(y_transformed, reduced_oof_pred, X['sector'])
+    print_strata(reduced_conformal_table, reduced_oof_pred, X['sector'])
+
     # Save model and data
     print(f'\nSaving model and data...')
     os.makedirs('../models', exist_ok=True)
@@ -103,9 +146,31 @@ def main():
     
     with open('../models/df.pkl', 'wb') as f:
         pickle.dump(df, f)
+
+    write_table(conformal_table, '../models/conformal_intervals.json')
+
+    # Compact manifest the app reads instead of df.pkl
+    write_manifest(build_manifest(df, '../models/pipeline.pkl'), '../models/model_manifest.json')
     
+    with open('../models/pipeline_reduced.pkl', 'wb') as f:
+        pickle.dump(reduced_pipeline, f)
+    save_report(reduced_report, '../models/reduced_model_report.json')
+    write_table(reduced_conformal_table, '../models/conformal_intervals_reduced.json')
+
+    # Flattened arrays for the NumPy inference engine (--engine compiled), tied to the saved pickle
+    np.savez('../models/svr_kernel.npz', **export_pipeline(pipeline, file_sha256('../models/pipeline.pkl')))
+
+    # Price surface for the what-if explorer
+    np.savez('../models/price_surface.npz', **build_surface(pipeline, df))
+
     print(f'Model saved to: ../models/pipeline.pkl')
     print(f'Data saved to: ../models/df.pkl')
+    print(f'Manifest saved to: ../models/model_manifest.json')
+    print(f'Conformal intervals saved to: ../models/conformal_intervals.json')
+    print(f'Compiled kernel saved to: ../models/svr_kernel.npz')
+    print(f'Price surface saved to: ../models/price_surface.npz')
+    print(f'Reduced model saved to: ../models/pipeline_reduced.pkl')
+    print(f'Reduced model intervals saved to: ../models/conformal_intervals_reduced.json')
     
     # Sample predictions
     print(f'\nSample Predictions:')
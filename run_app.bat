@@ -7,6 +7,12 @@ echo.
 echo Installing dependencies...
 pip install -r requirements.txt
 echo.
+echo Checking columnar datasets...
+python -m app.core.columnar --if-stale
+echo.
+echo Checking recommender artifacts...
+python -m app.core.recommender --if-stale
+echo.
 echo Starting Streamlit application...
 streamlit run app/Home.py
 pause
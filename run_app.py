@@ -43,6 +43,15 @@ def main():
         print("❌ Error installing dependencies!")
         return
     
+    # Pre-parse datasets into memory-mappable columnar files (first run, or after a CSV changed)
+    python_path = 'venv\\Scripts\\python.exe' if os.name == 'nt' else 'venv/bin/python'
+    print("🗂️  Checking columnar datasets...")
+    subprocess.run([python_path, '-m', 'app.core.columnar', '--if-stale'])
+
+    # Precompute the recommender similarity matrices (first run, or after the listings CSV changed)
+    print("🧭 Checking recommender artifacts...")
+    subprocess.run([python_path, '-m', 'app.core.recommender', '--if-stale'])
+    
     # Start Streamlit
     print("🚀 Starting Real Estate Analytics Platform...")
     print("📍 Application will open in your browser at: http://localhost:8501")